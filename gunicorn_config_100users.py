@@ -3,8 +3,20 @@ Gunicorn配置文件 - 每天100用户优化版
 针对每天100人访问量的服务器配置优化
 适用于2核2GB或2核4GB服务器
 """
+# gevent协程模式：preload_app=True 时应用在master进程中导入，
+# 必须在加载应用之前完成猴子补丁，requests/pymysql 的socket才会变为非阻塞
+from gevent import monkey
+monkey.patch_all()
+
+import gc
 import multiprocessing
 import os
+import threading
+import time
+from logging.handlers import MemoryHandler, WatchedFileHandler
+
+# 预加载期间关闭GC，避免master中的对象被GC扫描后写入引用计数页，破坏fork后的写时复制共享
+gc.disable()
 
 # 服务器socket
 bind = "0.0.0.0:5001"
@@ -13,8 +25,8 @@ backlog = 512  # 降低backlog，节省内存
 # 工作进程配置 - 针对100人/天优化
 # 平均并发2-5人，峰值10-15人
 workers = 2  # 2个worker足够处理峰值并发
-worker_class = "sync"  # sync模式最稳定，适合CPU密集型任务
-worker_connections = 500  # 降低连接数
+worker_class = "gevent"  # 协程模式，AI接口等待期间可继续处理其他请求
+worker_connections = 500  # 每个worker最大并发协程数
 timeout = 90  # 增加超时时间，适应复杂ER图渲染
 keepalive = 2
 
@@ -29,6 +41,60 @@ errorlog = "/www/wwwroot/ybcybcybc.xyz/sql4/logs/gunicorn_error.log"
 loglevel = "warning"  # 降低日志级别，减少IO
 access_log_format = '%(h)s "%(r)s" %(s)s %(b)s %(D)s'  # 简化日志格式
 
+# 访问日志经内存缓冲后批量写入文件：每200条、出现ERROR或每隔5秒刷新一次
+# 使用 WatchedFileHandler，由外部 logrotate 切割日志，各worker发现文件被替换后自动重新打开
+# 根日志不挂处理器，Flask 的 app.logger 仍通过 wsgi.errors 写入 gunicorn 错误日志
+ACCESS_LOG_FLUSH_INTERVAL = 5
+
+
+class TimedMemoryHandler(MemoryHandler):
+    """MemoryHandler 之外再定时刷新，访问量低时日志也不会长时间留在缓冲区"""
+
+    def __init__(self, capacity, flush_interval, target):
+        super().__init__(capacity, target=target)
+        self.flush_interval = flush_interval
+        self._flusher_pid = None
+
+    def emit(self, record):
+        # 刷新线程在各worker中第一次写日志时启动，master中不会有残留线程
+        if self._flusher_pid != os.getpid():
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_loop, name='access-log-flusher', daemon=True).start()
+        super().emit(record)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+def buffered_access_handler(filename, capacity, flush_interval):
+    """供 logconfig_dict 使用的访问日志处理器工厂"""
+    return TimedMemoryHandler(capacity, flush_interval, WatchedFileHandler(filename, encoding="utf-8"))
+
+
+logconfig_dict = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "root": {"level": "INFO", "handlers": []},
+    "loggers": {
+        "gunicorn.access": {
+            "level": "INFO",
+            "handlers": ["access_buffer"],
+            "propagate": False,
+            "qualname": "gunicorn.access"
+        }
+    },
+    "handlers": {
+        "access_buffer": {
+            "()": buffered_access_handler,
+            "filename": accesslog,
+            "capacity": 200,
+            "flush_interval": ACCESS_LOG_FLUSH_INTERVAL
+        }
+    }
+}
+
 # 进程管理
 proc_name = "sql_to_er_100users"
 daemon = False
@@ -40,10 +106,38 @@ limit_request_fields = 50  # 限制请求头数量
 limit_request_field_size = 4096  # 限制请求头大小
 
 # 内存优化
-worker_tmp_dir = "/dev/shm"  # 使用内存文件系统（如果可用）
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None  # 使用内存文件系统（如果可用）
 
 # 说明：
-# - 2个worker可以处理约4-8个并发请求
+# - 2个gevent worker可同时挂起数百个等待AI接口响应的请求
 # - 每个worker约占用80-150MB内存
 # - 总内存占用约200-400MB（不含MySQL）
-# - 适合2GB内存服务器，4GB内存更佳
\ No newline at end of file
+# - 适合2GB内存服务器，4GB内存更佳
+
+
+# 进程钩子
+def when_ready(server):
+    """master预加载完成后冻结现有对象，移出GC跟踪，worker间共享内存页"""
+    gc.freeze()
+    server.log.info("gc frozen objects: %s", gc.get_freeze_count())
+
+
+def pre_fork(server, worker):
+    """fork前检查master中残留的后台线程，这些线程不会被复制到worker中"""
+    import threading
+    for thread in threading.enumerate():
+        if thread is not threading.main_thread():
+            server.log.warning("ghost thread before fork: %s", thread.name)
+    # 分配当前存活worker未占用的最小槽位号，重启的worker复用退出worker的槽位，
+    # worker.age 会随 max_requests 重启不断增长，不能直接用来分配核心
+    used_slots = {getattr(w, 'cpu_slot', None) for w in server.WORKERS.values()}
+    worker.cpu_slot = next(slot for slot in range(len(used_slots) + 1) if slot not in used_slots)
+
+
+def post_fork(server, worker):
+    """worker启动后重新开启GC，并将worker绑定到固定CPU核心"""
+    gc.enable()
+    # 按worker槽位号轮流绑定核心，避免进程在核心间迁移导致缓存失效（仅Linux支持）
+    if hasattr(os, 'sched_setaffinity'):
+        cores = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, {cores[worker.cpu_slot % len(cores)]})
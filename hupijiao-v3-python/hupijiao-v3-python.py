@@ -4,10 +4,13 @@ import hashlib
 import time
 import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import random
 import string
 import os
-from urllib.parse import urlencode, unquote_plus
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # 尝试从config文件加载域名配置
 try:
@@ -16,12 +19,25 @@ try:
 except ImportError:
     DEFAULT_DOMAIN = 'http://localhost:5000'
 
-def ksort(d):
-    return [(k, d[k]) for k in sorted(d.keys())]
+logger = logging.getLogger(__name__)
+
+# 复用连接池：同一支付接口的TCP/TLS连接在多次支付间保持复用
+# 重试只针对建立连接失败，POST请求发出后不会自动重发，避免重复下单
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+))
+
+# 当前支付接口超过该秒数仍未响应时，再向下一个接口发起请求
+HEDGE_DELAY = 3
+
+NONCE_ALPHABET = string.ascii_letters + string.digits
 
 def generate_nonce_str(length=16):
     """生成随机字符串"""
-    return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
+    return ''.join(random.choices(NONCE_ALPHABET, k=length))
 
 class Hupi(object):
     def __init__(self, appid=None, appsecret=None, domain=None):
@@ -46,42 +62,37 @@ class Hupi(object):
         self.callback_url = self.domain + '/payment/callback/'
     
     def curl(self, data, url):
-        """发送HTTP请求"""
-        data['hash'] = self.sign(data)
-        print(f"支付请求数据: {data}")
+        """发送HTTP请求（不修改传入的data，签名结果只放在本次请求的副本中）"""
+        data = {**data, 'hash': self.sign(data)}
+        logger.debug("支付请求数据: %s", data)
         headers = {
             "Referer": config.domain,
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
         }
         try:
-            r = requests.post(url, data=data, headers=headers, timeout=30)
-            print(f"支付接口响应: {r.status_code} - {r.text}")
+            r = _SESSION.post(url, data=data, headers=headers, timeout=30)
+            logger.debug("支付接口响应: %s - %s", r.status_code, r.text)
             return r
         except Exception as e:
-            print(f"支付请求异常: {e}")
+            logger.warning("支付请求异常: %s", e)
             raise e
 
     def sign(self, attributes):
         """生成签名"""
-        # 过滤空值并排序
-        filtered_data = {k: v for k, v in attributes.items() if v is not None and v != ''}
-        sorted_data = ksort(filtered_data)
+        # 过滤空值并按键排序，直接拼接 key=value（与urlencode后再unquote_plus的结果一致）
+        sorted_items = sorted((k, v) for k, v in attributes.items() if v is not None and v != '')
         
-        print(f"签名参数: {sorted_data}")
+        logger.debug("签名参数: %s", sorted_items)
         
         # 构建签名字符串
-        sign_str = urlencode(sorted_data)
-        sign_str = unquote_plus(sign_str)
-        sign_str += self.AppSecret
+        sign_str = '&'.join(f"{k}={v}" for k, v in sorted_items) + self.AppSecret
         
-        print(f"签名字符串: {sign_str}")
+        logger.debug("签名字符串: %s", sign_str)
         
-        # 生成MD5签名
-        m = hashlib.md5()
-        m.update(sign_str.encode('utf-8'))
-        sign = m.hexdigest().lower()  # 确保是小写
+        # 生成MD5签名（hexdigest本身即为小写）
+        sign = hashlib.md5(sign_str.encode('utf-8')).hexdigest()
         
-        print(f"生成签名: {sign}")
+        logger.debug("生成签名: %s", sign)
         return sign
 
     def Pay(self, trade_order_id, payment, total_fee, title, **kwargs):
@@ -111,33 +122,57 @@ class Hupi(object):
         if kwargs.get('attach'):
             data['attach'] = kwargs['attach']
         
-        # 尝试不同的API接口
+        # 按顺序请求支付接口：当前接口失败时立即换下一个；
+        # 超过 HEDGE_DELAY 秒仍未响应时，再向下一个接口发出同一订单，采用最先成功的响应
+        # 主接口正常时只会发出一次下单请求，不再同时向所有接口下单
         last_error = None
-        for api_url in self.api_urls:
-            try:
-                print(f"尝试支付接口: {api_url}")
-                response = self.curl(data, api_url)
-                
-                if response.status_code == 200:
+        api_urls = iter(self.api_urls)
+        pending = {}
+        executor = ThreadPoolExecutor(max_workers=len(self.api_urls))
+
+        def try_next():
+            api_url = next(api_urls, None)
+            if api_url is not None:
+                pending[executor.submit(self.curl, data, api_url)] = api_url
+
+        try:
+            try_next()
+            while pending:
+                done, _ = wait(pending, timeout=HEDGE_DELAY, return_when=FIRST_COMPLETED)
+                if not done:
+                    logger.warning("支付接口 %s 响应缓慢，同时尝试下一个接口", list(pending.values()))
+                    try_next()
+                    continue
+
+                for future in done:
+                    api_url = pending.pop(future)
                     try:
-                        result = response.json()
-                        if result.get('errcode') == 0:
-                            return response
-                        else:
-                            print(f"支付接口返回错误: {result}")
-                            last_error = result.get('errmsg', '支付接口错误')
-                    except json.JSONDecodeError:
-                        print(f"支付接口返回非JSON数据: {response.text}")
-                        last_error = "支付接口返回格式错误"
-                else:
-                    print(f"支付接口HTTP错误: {response.status_code}")
-                    last_error = f"HTTP {response.status_code}"
-                    
-            except Exception as e:
-                print(f"支付接口 {api_url} 调用失败: {e}")
-                last_error = str(e)
-                continue
-        
+                        response = future.result()
+                    except Exception as e:
+                        logger.warning("支付接口 %s 调用失败: %s", api_url, e)
+                        last_error = str(e)
+                        try_next()
+                        continue
+
+                    if response.status_code == 200:
+                        try:
+                            result = response.json()
+                            if result.get('errcode') == 0:
+                                return response
+                            else:
+                                logger.warning("支付接口返回错误: %s", result)
+                                last_error = result.get('errmsg', '支付接口错误')
+                        except json.JSONDecodeError:
+                            logger.warning("支付接口返回非JSON数据: %s", response.text)
+                            last_error = "支付接口返回格式错误"
+                    else:
+                        logger.warning("支付接口HTTP错误: %s", response.status_code)
+                        last_error = f"HTTP {response.status_code}"
+                    try_next()
+        finally:
+            # 已拿到结果时不等待其余请求完成
+            executor.shutdown(wait=False, cancel_futures=True)
+
         # 所有接口都失败，抛出异常
         raise Exception(f"所有支付接口都无法使用，最后错误: {last_error}")
     
@@ -148,7 +183,7 @@ class Hupi(object):
             calculated_hash = self.sign(post_data)
             return received_hash == calculated_hash
         except Exception as e:
-            print(f"验证通知签名失败: {e}")
+            logger.error("验证通知签名失败: %s", e)
             return False
 
 if __name__ == "__main__":
@@ -5,8 +5,14 @@
 """
 
 import pymysql
+from pymysql.constants import CLIENT
+import sqlparse
 import sys
 import os
+import hashlib
+import random
+import string
+from pathlib import Path
 
 # 数据库配置
 DB_CONFIG = {
@@ -16,6 +22,11 @@ DB_CONFIG = {
     'charset': 'utf8mb4'
 }
 
+# 测试用户种子数据：(用户名, 密码, 初始余额)
+TEST_USERS = [
+    ('testuser', '123456', 100.00),
+]
+
 def create_database():
     """创建数据库"""
     try:
@@ -36,37 +47,50 @@ def create_database():
     
     return True
 
+def execute_sql_statements(connection, sql_content):
+    """逐条执行SQL语句，单独处理每条语句的错误（sql_content为UTF-8字节串）"""
+    # 使用sqlparse分割SQL语句，字符串和注释中的分号不会被误切分
+    sql_statements = [stmt.strip().rstrip(';') for stmt in sqlparse.split(sql_content.decode('utf-8')) if stmt.strip()]
+
+    with connection.cursor() as cursor:
+        for i, statement in enumerate(sql_statements):
+            if statement.strip() and not statement.upper().startswith(('CREATE DATABASE', 'USE ')):
+                try:
+                    cursor.execute(statement)
+                    print(f"✓ 执行SQL语句 {i+1}/{len(sql_statements)}")
+                except Exception as e:
+                    if "already exists" not in str(e).lower():
+                        print(f"✗ SQL语句执行失败: {statement[:50]}... - {e}")
+                    else:
+                        print(f"✓ 跳过已存在的对象: {statement[:50]}...")
+
 def execute_sql_file():
     """执行SQL文件创建表结构"""
     try:
-        # 连接到user_system数据库
+        # 连接到user_system数据库，允许一次发送多条语句
         config = DB_CONFIG.copy()
         config['database'] = 'user_system'
-        connection = pymysql.connect(**config)
+        connection = pymysql.connect(**config, client_flag=CLIENT.MULTI_STATEMENTS)
         
-        # 读取SQL文件
+        # 读取SQL文件（保持字节串，pymysql可直接发送，无需解码）
         sql_file_path = os.path.join(os.path.dirname(__file__), 'user_system.sql')
-        with open(sql_file_path, 'r', encoding='utf-8') as file:
-            sql_content = file.read()
+        sql_content = Path(sql_file_path).read_bytes()
         
         # 先切换到正确的数据库
         with connection.cursor() as cursor:
             cursor.execute("USE user_system")
 
-        # 分割SQL语句（以分号分隔）
-        sql_statements = [stmt.strip() for stmt in sql_content.split(';') if stmt.strip()]
-
-        with connection.cursor() as cursor:
-            for i, statement in enumerate(sql_statements):
-                if statement.strip() and not statement.upper().startswith(('CREATE DATABASE', 'USE ')):
-                    try:
-                        cursor.execute(statement)
-                        print(f"✓ 执行SQL语句 {i+1}/{len(sql_statements)}")
-                    except Exception as e:
-                        if "already exists" not in str(e).lower():
-                            print(f"✗ SQL语句执行失败: {statement[:50]}... - {e}")
-                        else:
-                            print(f"✓ 跳过已存在的对象: {statement[:50]}...")
+        # 整个脚本一次发送，只需一次网络往返
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql_content)
+                while cursor.nextset():
+                    pass
+            print("✓ 批量执行SQL脚本成功")
+        except Exception as e:
+            # 批量执行中途失败（如对象已存在）时改为逐条执行
+            print(f"批量执行失败，改为逐条执行: {e}")
+            execute_sql_statements(connection, sql_content)
         
         connection.commit()
         connection.close()
@@ -86,31 +110,30 @@ def create_test_user():
         connection = pymysql.connect(**config)
         
         with connection.cursor() as cursor:
-            # 检查是否已存在测试用户
-            cursor.execute("SELECT id FROM users WHERE username = 'testuser'")
-            if cursor.fetchone():
-                print("✓ 测试用户 'testuser' 已存在")
-                return True
-
-            # 创建测试用户
-            import hashlib
-            import random
-            import string
-
-            password_hash = hashlib.sha256('123456'.encode()).hexdigest()
-            invite_code = ''.join(random.choices(string.ascii_uppercase, k=2)) + ''.join(random.choices(string.digits, k=6))
+            # 构建种子数据，已存在的用户名会被忽略
+            rows = []
+            for username, password, balance in TEST_USERS:
+                password_hash = hashlib.sha256(password.encode()).hexdigest()
+                invite_code = ''.join(random.choices(string.ascii_uppercase, k=2)) + ''.join(random.choices(string.digits, k=6))
+                rows.append((username, password_hash, balance, invite_code))
 
-            cursor.execute("""
+            # executemany 会合并为一条多行 INSERT，只需一次往返
+            cursor.executemany("""
                 INSERT INTO users (username, password_hash, balance, invite_code)
                 VALUES (%s, %s, %s, %s)
-            """, ('testuser', password_hash, 100.00, invite_code))
+                ON DUPLICATE KEY UPDATE username = username
+            """, rows)
+            created_count = cursor.rowcount
 
             connection.commit()
-            print(f"✓ 测试用户创建成功")
-            print(f"  用户名: testuser")
-            print(f"  密码: 123456")
-            print(f"  初始余额: ¥100.00")
-            print(f"  邀请码: {invite_code}")
+            if created_count == 0:
+                print("✓ 测试用户已存在")
+            else:
+                print(f"✓ 测试用户创建成功（{created_count}个）")
+            for username, password, balance in TEST_USERS:
+                print(f"  用户名: {username}")
+                print(f"  密码: {password}")
+                print(f"  初始余额: ¥{balance:.2f}")
         
         connection.close()
         
@@ -0,0 +1,40 @@
+-- =====================================================
+-- 用户列表/用户导出查询索引迁移脚本
+-- 管理后台的用户列表和导出都按 role、status 过滤，按 id 或 created_at 排序，
+-- 搜索使用用户名/邮箱前缀匹配
+-- 执行方式: mysql -u root -p your_database < migrate_user_search_index.sql
+-- MySQL 8.0 不支持 CREATE INDEX IF NOT EXISTS，这里先查 information_schema，
+-- 索引不存在时才创建，脚本可以重复执行
+-- =====================================================
+
+-- 1. 用户列表：WHERE role = 'user' AND status = ? ORDER BY id DESC
+--    InnoDB 二级索引自带主键 id，等值过滤后可直接按 id 倒序读取，无需filesort
+SET @sql = IF(
+    (SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users' AND INDEX_NAME = 'idx_role_status') = 0,
+    'CREATE INDEX `idx_role_status` ON `users` (`role`, `status`)',
+    'SELECT ''idx_role_status 已存在'''
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 2. 用户导出：按注册时间范围过滤、默认按 created_at 排序
+SET @sql = IF(
+    (SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users' AND INDEX_NAME = 'idx_role_created_at') = 0,
+    'CREATE INDEX `idx_role_created_at` ON `users` (`role`, `created_at`)',
+    'SELECT ''idx_role_created_at 已存在'''
+);
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 3. 用户名/邮箱前缀搜索（LIKE 'xxx%'）直接使用 user_system.sql 中已有的 idx_username、idx_email，
+--    两个条件用 OR 连接时 MySQL 可做 index_merge，无需再建索引
+
+
+-- 4. 验证索引是否生效
+-- SHOW INDEX FROM users;
+-- EXPLAIN SELECT id FROM users WHERE role = 'user' AND status = 1 ORDER BY id DESC LIMIT 21;
+-- EXPLAIN SELECT id FROM users WHERE role = 'user' AND (username LIKE 'abc%' OR email LIKE 'abc%');
@@ -4,14 +4,47 @@ SQL to ER Diagram Converter - Main Program
 Converts SQL CREATE TABLE statements to Entity-Relationship diagrams
 """
 import argparse
+import hashlib
+import locale
+import mmap
+import shutil
 import sys
+import time
 from pathlib import Path
 
+import graphviz
+
 # Add src to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
 
 from src import parse_sql, build_er_model, render_er_diagram
 
+# Rendered diagrams are cached by SQL content hash so identical input skips
+# parsing and Graphviz layout entirely
+CACHE_DIR = Path("output") / ".cache"
+CACHE_TTL = 3600  # seconds
+
+
+def get_cache_path(sql_content: str) -> Path:
+    """Return the cache file path for the given SQL content"""
+    digest = hashlib.blake2b(sql_content.encode("utf-8"), digest_size=32).hexdigest()
+    return CACHE_DIR / f"{digest}.png"
+
+
+def read_sql_file(input_path: Path) -> str:
+    """
+    Read a SQL file, decoding straight from a memory map
+
+    Avoids holding a full bytes copy of the file next to the decoded
+    string, which matters for multi-MB dumps.
+    """
+    encoding = locale.getpreferredencoding(False)
+    with open(input_path, "rb") as f:
+        if input_path.stat().st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return str(mm, encoding)
+
 
 def sql_to_er(sql_content: str, output_name: str = "er_diagram", view: bool = True):
     """
@@ -22,6 +55,16 @@ def sql_to_er(sql_content: str, output_name: str = "er_diagram", view: bool = Tr
         output_name: Output filename (without extension)
         view: Whether to open the diagram after rendering
     """
+    cache_path = get_cache_path(sql_content)
+    if cache_path.exists() and time.time() - cache_path.stat().st_mtime < CACHE_TTL:
+        output_path = f"output/{output_name}.png"
+        shutil.copyfile(cache_path, output_path)
+        print("⚡ Using cached ER diagram for identical SQL")
+        if view:
+            graphviz.view(output_path)
+        print(f"\n✅ ER diagram saved to: {output_path}")
+        return output_path
+
     print("🔍 Parsing SQL statements...")
     tables, error = parse_sql(sql_content)
     
@@ -41,6 +84,8 @@ def sql_to_er(sql_content: str, output_name: str = "er_diagram", view: bool = Tr
     
     print("\n🎨 Rendering ER diagram...")
     output_path = render_er_diagram(entities, relationships, output_name, view)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(output_path, cache_path)
     
     print(f"\n✅ ER diagram saved to: {output_path}")
     return output_path
@@ -79,7 +124,7 @@ def main():
             sys.exit(1)
         
         print(f"📝 Reading SQL from: {args.input}")
-        sql_content = input_path.read_text()
+        sql_content = read_sql_file(input_path)
     
     # Convert to ER diagram
     try:
@@ -2,14 +2,104 @@
 Doc Generator Module - Generates database schema documentation
 in various formats from parsed SQL metadata.
 """
-from typing import Dict, Any, List, Tuple
+from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
+from html import escape
+from xml.sax.saxutils import escape as xml_escape
+from typing import Dict, Any, Iterator, List, Tuple
 from docx import Document
 from docx.shared import Pt, Cm
-from docx.oxml.ns import qn
-from docx.oxml import OxmlElement
+from docx.oxml.ns import nsdecls
+from docx.oxml import parse_xml
 import re
 
+# 数据类型及长度，例如 VARCHAR(50)
+_TYPE_RE = re.compile(r'^(\w+)(?:\(([^)]+)\))?')
 
+# 数据类型名称标准化，未列出的类型保持原样
+_TYPE_NORMALIZE = {
+    'CHAR': 'VARCHAR',
+    'INTEGER': 'INT',
+    'NUMERIC': 'DECIMAL',
+    'LONGTEXT': 'TEXT',
+    'TIMESTAMP': 'DATETIME',
+}
+
+
+# HTML数据行模板，由 str.format_map 填充
+_ROW_TMPL = """
+                            <tr>
+                                <td><span class="field-name">{name}</span></td>
+                                <td><span class="field-type">{type}</span></td>
+                                <td>{length}</td>
+                                <td{nullable_cls}>{nullable}</td>
+                                <td{pk_cls}>{pk}</td>
+                                <td{default_cls}>{default}</td>
+                                <td>{comment}</td>
+                            </tr>"""
+
+
+# 列字典中生成文档所需的字段，按固定顺序一次取出
+_COLUMN_FIELDS = itemgetter('name', 'type', 'nullable', 'pk', 'default', 'comment')
+
+
+def _unpack_column(col: Dict[str, Any]) -> Tuple:
+    """
+    取出列的 (字段名, 类型, 允许空, 主键, 默认值, 注释)
+    parse_sql 输出的列字段齐全，直接用 itemgetter；缺字段时按原默认值逐个获取
+    """
+    try:
+        return _COLUMN_FIELDS(col)
+    except KeyError:
+        get = col.get
+        return get('name', ''), get('type', ''), get('nullable', True), get('pk'), get('default'), get('comment')
+
+
+def _normalize_tables(tables_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    把表结构元数据整理成文档各列的显示值，供HTML与DOCX生成共用
+    每个表增加 '_rows'，每列为 (字段名, 类型, 长度, 允许空, 主键, 有默认值, 默认值文本, 说明)
+    已整理过的表原样返回，同时生成两种格式时只需整理一次
+    """
+    normalized = {}
+    for table_name, data in tables_data.items():
+        if '_rows' in data:
+            normalized[table_name] = data
+            continue
+
+        # 获取主键集合，每个表构建一次，逐列判断为O(1)
+        primary_keys = frozenset(data.get('primary_keys', []))
+
+        rows = []
+        for col in data["columns"]:
+            field_name, data_type_full, nullable, is_pk, default_val, comment = _unpack_column(col)
+
+            # 字段类型和长度处理
+            data_type, length = _extract_type_and_length(data_type_full)
+
+            # 默认值处理
+            if default_val is None:
+                default_text = 'NULL' if nullable else '-'
+            else:
+                default_text = str(default_val)
+
+            rows.append((
+                field_name,
+                data_type,
+                length,
+                nullable,
+                bool(is_pk or field_name in primary_keys),
+                default_val is not None,
+                default_text,
+                comment if comment else '-',
+            ))
+
+        normalized[table_name] = {**data, '_rows': rows}
+    return normalized
+
+
+@lru_cache(maxsize=256)
 def _extract_type_and_length(data_type_full: str) -> Tuple[str, str]:
     """
     从完整的数据类型字符串中提取类型和长度
@@ -21,134 +111,86 @@ def _extract_type_and_length(data_type_full: str) -> Tuple[str, str]:
         return 'UNKNOWN', '-'
 
     # 使用正则表达式匹配类型和长度
-    match = re.match(r'^(\w+)(?:\(([^)]+)\))?', data_type_full.upper())
+    match = _TYPE_RE.match(data_type_full.upper())
     if match:
         data_type = match.group(1)
         length = match.group(2) if match.group(2) else '-'
 
         # 标准化数据类型名称
-        if data_type in ['VARCHAR', 'CHAR']:
-            data_type = 'VARCHAR'
-        elif data_type in ['INT', 'INTEGER']:
-            data_type = 'INT'
-        elif data_type in ['BIGINT']:
-            data_type = 'BIGINT'
-        elif data_type in ['DECIMAL', 'NUMERIC']:
-            data_type = 'DECIMAL'
-        elif data_type in ['TEXT', 'LONGTEXT']:
-            data_type = 'TEXT'
-        elif data_type in ['DATE']:
-            data_type = 'DATE'
-        elif data_type in ['DATETIME', 'TIMESTAMP']:
-            data_type = 'DATETIME'
-
-        return data_type, length
+        return _TYPE_NORMALIZE.get(data_type, data_type), length
     else:
         return data_type_full.upper(), '-'
 
 
-def _set_triple_line_style(table):
+def _border_xml(border_name: str, sz: str = None) -> str:
     """
-    应用标准三线表样式 - 只有三条线
-    - 表格顶部粗线
-    - 标题行下方细线  
-    - 表格底部粗线
-    - 无任何垂直线或其他横线
+    单条边框的XML：给定粗细时为黑色单实线，否则为无
+    sz单位为1/8磅，例如 '12' 为1.5pt粗线，'6' 为0.75pt细线
     """
-    # 清除表格所有默认边框
-    tbl = table._tbl
-    
-    # 移除表格样式，避免样式冲突
-    tbl_pr = tbl.tblPr
-    if tbl_pr is None:
-        tbl_pr = OxmlElement('w:tblPr')
-        tbl.insert(0, tbl_pr)
-    
-    # 清除所有现有边框
-    old_borders = tbl_pr.find(qn('w:tblBorders'))
-    if old_borders is not None:
-        tbl_pr.remove(old_borders)
-    
-    # 设置表格边框为无
-    tbl_borders = OxmlElement('w:tblBorders')
-    for border_name in ['top', 'left', 'bottom', 'right', 'insideH', 'insideV']:
-        border = OxmlElement(f'w:{border_name}')
-        border.set(qn('w:val'), 'nil')
-        tbl_borders.append(border)
-    tbl_pr.append(tbl_borders)
-    
-    # 清除所有单元格边框
-    for row in table.rows:
-        for cell in row.cells:
-            tc_pr = cell._tc.get_or_add_tcPr()
-            # 移除旧的边框
-            old_borders = tc_pr.find(qn('w:tcBorders'))
-            if old_borders is not None:
-                tc_pr.remove(old_borders)
-            
-            # 设置无边框
-            tc_borders = OxmlElement('w:tcBorders')
-            for border_name in ['top', 'left', 'bottom', 'right']:
-                border = OxmlElement(f'w:{border_name}')
-                border.set(qn('w:val'), 'nil')
-                tc_borders.append(border)
-            tc_pr.append(tc_borders)
-    
-    # 只添加三条线
-    # 1. 顶线（第一行的顶部）- 粗线
-    for cell in table.rows[0].cells:
-        tc_pr = cell._tc.get_or_add_tcPr()
-        tc_borders = tc_pr.find(qn('w:tcBorders'))
-        if tc_borders is None:
-            tc_borders = OxmlElement('w:tcBorders')
-            tc_pr.append(tc_borders)
-        
-        # 添加顶部边框
-        top = OxmlElement('w:top')
-        top.set(qn('w:val'), 'single')
-        top.set(qn('w:sz'), '12')  # 1.5pt 粗线
-        top.set(qn('w:space'), '0')
-        top.set(qn('w:color'), '000000')
-        tc_borders.append(top)
-    
-    # 2. 栏目线（第一行的底部）- 细线
-    for cell in table.rows[0].cells:
-        tc_pr = cell._tc.get_or_add_tcPr()
-        tc_borders = tc_pr.find(qn('w:tcBorders'))
-        if tc_borders is None:
-            tc_borders = OxmlElement('w:tcBorders')
-            tc_pr.append(tc_borders)
-        
-        # 添加底部边框
-        bottom = OxmlElement('w:bottom')
-        bottom.set(qn('w:val'), 'single')
-        bottom.set(qn('w:sz'), '6')  # 0.75pt 细线
-        bottom.set(qn('w:space'), '0')
-        bottom.set(qn('w:color'), '000000')
-        tc_borders.append(bottom)
-    
-    # 3. 底线（最后一行的底部）- 粗线
-    for cell in table.rows[-1].cells:
-        tc_pr = cell._tc.get_or_add_tcPr()
-        tc_borders = tc_pr.find(qn('w:tcBorders'))
-        if tc_borders is None:
-            tc_borders = OxmlElement('w:tcBorders')
-            tc_pr.append(tc_borders)
-        
-        # 添加底部边框
-        bottom = OxmlElement('w:bottom')
-        bottom.set(qn('w:val'), 'single')
-        bottom.set(qn('w:sz'), '12')  # 1.5pt 粗线
-        bottom.set(qn('w:space'), '0')
-        bottom.set(qn('w:color'), '000000')
-        tc_borders.append(bottom)
+    if sz is None:
+        return f'<w:{border_name} w:val="nil"/>'
+    return f'<w:{border_name} w:val="single" w:sz="{sz}" w:space="0" w:color="000000"/>'
 
 
-def generate_html(tables_data: Dict[str, Any]) -> str:
+# 表格各列：表头文字、列宽、数据单元格对齐方式
+# 字段名、字段类型、长度、允许空、主键、默认值、说明 - 7列布局，调整列宽以防止挤压
+_HEADERS = ("字段名", "字段类型", "长度", "允许空", "主键", "默认值", "说明")
+_COLUMN_WIDTHS = (Cm(3.0), Cm(2.5), Cm(1.5), Cm(1.5), Cm(1.5), Cm(2.5), Cm(5.5))  # 总宽度约17.5cm
+# 字段名、字段类型、说明左对齐，长度、允许空、主键、默认值居中
+_DATA_ALIGNS = ('left', 'left', 'center', 'center', 'center', 'center', 'left')
+
+# 表头：加粗、五号字(10.5磅)；数据行：10磅
+_HEADER_RPR_XML = '<w:rPr><w:rFonts w:ascii="宋体" w:hAnsi="宋体"/><w:b/><w:sz w:val="21"/></w:rPr>'
+_DATA_RPR_XML = '<w:rPr><w:rFonts w:ascii="宋体" w:hAnsi="宋体"/><w:sz w:val="20"/></w:rPr>'
+
+
+def _tc_borders_xml(top_sz: str = None, bottom_sz: str = None) -> str:
+    """单元格边框的XML，只有顶/底边可能为实线"""
+    return (
+        f'<w:tcBorders>{_border_xml("top", top_sz)}{_border_xml("left")}'
+        f'{_border_xml("bottom", bottom_sz)}{_border_xml("right")}</w:tcBorders>'
+    )
+
+
+def _row_xml_template(borders_xml: str, aligns: Tuple[str, ...], rpr_xml: str) -> str:
     """
-    生成带有三线表样式的HTML格式数据库结构文档
+    构建一行<w:tr>的XML模板，各单元格文本以 {0}~{6} 占位，由 str.format 填充
     """
-    css = """
+    cells = []
+    for i, (width, align) in enumerate(zip(_COLUMN_WIDTHS, aligns)):
+        cells.append(
+            f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width.twips}"/>{borders_xml}</w:tcPr>'
+            f'<w:p><w:pPr><w:jc w:val="{align}"/></w:pPr>'
+            f'<w:r>{rpr_xml}<w:t xml:space="preserve">{{{i}}}</w:t></w:r></w:p></w:tc>'
+        )
+    return '<w:tr>' + ''.join(cells) + '</w:tr>'
+
+
+# 三线表：顶线（首行顶部粗线）、栏目线（首行底部细线）、底线（末行底部粗线），
+# 表格级边框全部为无，线条只由单元格边框绘制
+_TBL_START_XML = (
+    f'<w:tbl {nsdecls("w")}><w:tblPr><w:tblW w:type="auto" w:w="0"/><w:tblBorders>'
+    + ''.join(_border_xml(name) for name in ('top', 'left', 'bottom', 'right', 'insideH', 'insideV'))
+    + '</w:tblBorders><w:tblLayout w:type="fixed"/>'
+    '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0"'
+    ' w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr><w:tblGrid>'
+    + ''.join(f'<w:gridCol w:w="{width.twips}"/>' for width in _COLUMN_WIDTHS)
+    + '</w:tblGrid>'
+)
+_TBL_END_XML = '</w:tbl>'
+_HEADER_ROW_XML = _row_xml_template(
+    _tc_borders_xml(top_sz='12', bottom_sz='6'), ('center',) * len(_HEADERS), _HEADER_RPR_XML
+).format(*_HEADERS)
+# 没有数据行时表头同时是末行，底部用粗线
+_HEADER_ONLY_ROW_XML = _row_xml_template(
+    _tc_borders_xml(top_sz='12', bottom_sz='12'), ('center',) * len(_HEADERS), _HEADER_RPR_XML
+).format(*_HEADERS)
+_BODY_ROW_XML = _row_xml_template(_tc_borders_xml(), _DATA_ALIGNS, _DATA_RPR_XML)
+_LAST_ROW_XML = _row_xml_template(_tc_borders_xml(bottom_sz='12'), _DATA_ALIGNS, _DATA_RPR_XML)
+
+
+# HTML预览样式，模块加载时构建一次
+_CSS = """
     <style>
         /* 完全隔离的预览容器样式 */
         .html-preview-container {
@@ -383,19 +425,50 @@ def generate_html(tables_data: Dict[str, Any]) -> str:
         }
     </style>
     """
+
+
+def _build_tbl_element(rows: List[Tuple]):
+    """
+    按模板拼出整张三线表的XML并一次解析，不经过 add_table/add_row/cells
+    只生成独立的<w:tbl>元素，由调用方插入文档
+    """
+    last = len(rows) - 1
+    xml_parts = [_TBL_START_XML, _HEADER_ROW_XML if rows else _HEADER_ONLY_ROW_XML]
+    for i, (field_name, data_type, length, nullable, is_pk, has_default, default_text, comment) in enumerate(rows):
+        row_xml = _LAST_ROW_XML if i == last else _BODY_ROW_XML
+        xml_parts.append(row_xml.format(
+            xml_escape(field_name),
+            xml_escape(data_type),
+            xml_escape(length),
+            '是' if nullable else '否',
+            '是' if is_pk else '否',
+            xml_escape(default_text),
+            xml_escape(comment),  # 说明
+        ))
+    xml_parts.append(_TBL_END_XML)
+    return parse_xml(''.join(xml_parts))
+
+
+def iter_html(tables_data: Dict[str, Any]) -> Iterator[str]:
+    """
+    逐段生成带有三线表样式的HTML格式数据库结构文档
+    写文件或流式响应时可直接 writelines/迭代输出，不必先拼出完整字符串
+    """
+    tables_data = _normalize_tables(tables_data)
     
     # 统计信息
     total_tables = len(tables_data)
     total_columns = sum(len(data["columns"]) for data in tables_data.values())
+    now_str = datetime.now().strftime('%Y年%m月%d日 %H:%M:%S')
     
-    html = f"""
+    yield f"""
     <!DOCTYPE html>
     <html>
     <head>
         <title>数据库结构文档</title>
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        {css}
+        {_CSS}
     </head>
     <body>
         <div class="html-preview-container">
@@ -403,7 +476,7 @@ def generate_html(tables_data: Dict[str, Any]) -> str:
             <div class="document-header">
                 <h1 class="document-title">数据库结构设计文档</h1>
                 <p class="document-info">
-                    生成时间：{__import__('datetime').datetime.now().strftime('%Y年%m月%d日 %H:%M:%S')}<br>
+                    生成时间：{now_str}<br>
                     数据表数量：{total_tables} 个 · 总字段数：{total_columns} 个
                 </p>
             </div>
@@ -414,9 +487,9 @@ def generate_html(tables_data: Dict[str, Any]) -> str:
     # 生成每个表的文档
     for idx, (table_name, data) in enumerate(tables_data.items()):
         # 表标题格式：表序号：表说明(英文名)
-        table_title = f"表{idx + 1}：{data.get('comment', table_name)}({table_name})"
+        table_title = escape(f"表{idx + 1}：{data.get('comment', table_name)}({table_name})")
         
-        html += f"""
+        yield f"""
                 <div class="table-section">
                     <h2 class="table-title">{table_title}</h2>
                     <table class="three-line-table">
@@ -433,50 +506,22 @@ def generate_html(tables_data: Dict[str, Any]) -> str:
                         </thead>
                         <tbody>"""
         
-        # 获取主键列表
-        primary_keys = data.get('primary_keys', [])
+        for field_name, data_type, length, nullable, is_pk, has_default, default_text, comment in data['_rows']:
+            # 用户输入的内容统一转义后再写入HTML
+            yield _ROW_TMPL.format_map({
+                'name': escape(field_name),
+                'type': escape(data_type),
+                'length': escape(length),
+                'nullable': '是' if nullable else '否',
+                'nullable_cls': '' if nullable else ' class="nullable-no"',
+                'pk': '是' if is_pk else '否',
+                'pk_cls': ' class="pk-yes"' if is_pk else '',
+                'default': escape(default_text),
+                'default_cls': ' class="default-value"' if has_default else '',
+                'comment': escape(comment),
+            })
         
-        for col in data["columns"]:
-            # 字段名
-            field_name = col.get('name', '')
-
-            # 字段类型和长度处理
-            data_type_full = col.get('type', '')
-            data_type, length = _extract_type_and_length(data_type_full)
-
-            # 允许空
-            nullable = col.get('nullable', True)
-            nullable_text = '是' if nullable else '否'
-            nullable_class = '' if nullable else ' class="nullable-no"'
-
-            # 主键
-            is_pk = col.get('pk') or col.get('name') in primary_keys
-            pk_text = '是' if is_pk else '否'
-            pk_class = ' class="pk-yes"' if is_pk else ''
-
-            # 默认值处理
-            default_val = col.get('default')
-            if default_val is None:
-                default_text = 'NULL' if nullable else '-'
-            else:
-                default_text = str(default_val)
-            default_class = ' class="default-value"' if default_val is not None else ''
-
-            # 说明
-            comment = col.get('comment', '-') if col.get('comment') else '-'
-
-            html += f"""
-                            <tr>
-                                <td><span class="field-name">{field_name}</span></td>
-                                <td><span class="field-type">{data_type}</span></td>
-                                <td>{length}</td>
-                                <td{nullable_class}>{nullable_text}</td>
-                                <td{pk_class}>{pk_text}</td>
-                                <td{default_class}>{default_text}</td>
-                                <td>{comment}</td>
-                            </tr>"""
-        
-        html += """
+        yield """
                         </tbody>
                     </table>"""
         
@@ -488,15 +533,15 @@ def generate_html(tables_data: Dict[str, Any]) -> str:
                 fk_info[fk['column']] = f"{fk['column']} → {fk['ref']['table']}.{fk['ref']['column']}"
         
         if fk_info:
-            notes.append("外键关系：" + "；".join(fk_info.values()))
+            notes.append(escape("外键关系：" + "；".join(fk_info.values())))
         
         if notes:
-            html += f'<div class="note">注：{"<br>".join(notes)}</div>'
+            yield f'<div class="note">注：{"<br>".join(notes)}</div>'
         
-        html += """
+        yield """
                 </div>"""
     
-    html += f"""
+    yield f"""
             </div>
             
             <div class="document-footer">
@@ -508,13 +553,20 @@ def generate_html(tables_data: Dict[str, Any]) -> str:
     </body>
     </html>
     """
-    return html
+
+
+def generate_html(tables_data: Dict[str, Any]) -> str:
+    """
+    生成带有三线表样式的HTML格式数据库结构文档
+    """
+    return "".join(iter_html(tables_data))
 
 
 def generate_docx(tables_data: Dict[str, Any], filename: str):
     """
     生成包含三线表格式的.docx文件，用于数据库结构文档
     """
+    tables_data = _normalize_tables(tables_data)
     doc = Document()
     
     # 设置文档标题
@@ -522,9 +574,10 @@ def generate_docx(tables_data: Dict[str, Any], filename: str):
     title.alignment = 1  # 居中
     
     # 添加文档信息
+    now_str = datetime.now().strftime('%Y年%m月%d日 %H:%M:%S')
     info_para = doc.add_paragraph()
     info_para.alignment = 1  # 居中
-    info_para.add_run(f'生成时间：{__import__("datetime").datetime.now().strftime("%Y年%m月%d日 %H:%M:%S")}\n').font.size = Pt(10)
+    info_para.add_run(f'生成时间：{now_str}\n').font.size = Pt(10)
     info_para.add_run(f'数据表数量：{len(tables_data)} 个\n').font.size = Pt(10)
     info_para.add_run(f'总字段数：{sum(len(data["columns"]) for data in tables_data.values())} 个').font.size = Pt(10)
     
@@ -545,87 +598,7 @@ def generate_docx(tables_data: Dict[str, Any], filename: str):
         table_heading.runs[0].font.bold = True
         table_heading.runs[0].font.size = Pt(12)  # 小四号字
         
-        # 创建表格 - 使用完整的列设计
-        headers = ["字段名", "字段类型", "长度", "允许空", "主键", "默认值", "说明"]
-        tbl = doc.add_table(rows=1, cols=len(headers))
-        # 不使用任何预定义样式
-        tbl.style = None
-        
-        # 设置表头
-        hdr_cells = tbl.rows[0].cells
-        for i, header_text in enumerate(headers):
-            hdr_cells[i].text = header_text
-            # 设置表头样式
-            for paragraph in hdr_cells[i].paragraphs:
-                paragraph.alignment = 1  # 居中
-                for run in paragraph.runs:
-                    run.font.bold = True
-                    run.font.name = '宋体'
-                    run.font.size = Pt(10.5)  # 五号字
-        
-        # 获取主键列表
-        primary_keys = data.get('primary_keys', [])
-        
-        # 添加数据行
-        for col in data["columns"]:
-            row_cells = tbl.add_row().cells
-
-            # 字段名
-            row_cells[0].text = col.get('name', '')
-
-            # 字段类型和长度处理
-            data_type_full = col.get('type', '')
-            data_type, length = _extract_type_and_length(data_type_full)
-            row_cells[1].text = data_type
-            row_cells[2].text = length
-
-            # 允许空
-            nullable = col.get('nullable', True)
-            row_cells[3].text = '是' if nullable else '否'
-
-            # 主键
-            is_pk = col.get('pk') or col.get('name') in primary_keys
-            row_cells[4].text = '是' if is_pk else '否'
-
-            # 默认值
-            default_val = col.get('default')
-            if default_val is None:
-                row_cells[5].text = 'NULL' if nullable else '-'
-            elif default_val == 'CURRENT_TIMESTAMP':
-                row_cells[5].text = 'CURRENT_TIMESTAMP'
-            else:
-                row_cells[5].text = str(default_val)
-
-            # 说明
-            row_cells[6].text = col.get('comment', '-') if col.get('comment') else '-'
-            
-            # 设置单元格对齐和字体
-            for i, cell in enumerate(row_cells):
-                for paragraph in cell.paragraphs:
-                    if i in [0, 6]:  # 字段名和说明左对齐
-                        paragraph.alignment = 0
-                    elif i in [2, 3, 4, 5]:  # 长度、允许空、主键、默认值居中
-                        paragraph.alignment = 1
-                    else:  # 字段类型左对齐
-                        paragraph.alignment = 0
-                    for run in paragraph.runs:
-                        run.font.name = '宋体'
-                        run.font.size = Pt(10)  # 五号字
-        
-        # 应用三线表样式
-        _set_triple_line_style(tbl)
-        
-        # 设置表格宽度
-        # 调整列宽以防止挤压 - 7列布局
-        # 字段名、字段类型、长度、允许空、主键、默认值、说明
-        widths = [Cm(3.0), Cm(2.5), Cm(1.5), Cm(1.5), Cm(1.5), Cm(2.5), Cm(5.5)]  # 总宽度约17.5cm
-        for i, width in enumerate(widths):
-            for row in tbl.rows:
-                row.cells[i].width = width
-        
-        # 设置表格属性，避免自动调整
-        tbl.autofit = False
-        tbl.allow_autofit = False
+        doc.element.body._insert_tbl(_build_tbl_element(data['_rows']))
         
         # 添加表注（如果有外键或特殊说明）
         notes = []
@@ -6,6 +6,8 @@ from typing import List, Optional, Dict, Any, Tuple
 
 class Entity:
     """Represents an entity (table) in the ER diagram"""
+
+    __slots__ = ('name', 'attributes', 'comment')
     
     def __init__(self, name: str, comment: str = None):
         self.name = name
@@ -26,6 +28,9 @@ class Entity:
 
 class Attribute:
     """Represents an attribute (column) of an entity."""
+
+    __slots__ = ('name', 'data_type', 'is_pk', 'is_fk', 'comment', 'display_name', 'nullable', 'default')
+
     def __init__(self, name: str, data_type: str, is_pk: bool = False, is_fk: bool = False, 
                  comment: Optional[str] = None, nullable: bool = True, default: Optional[str] = None):
         self.name = name
@@ -62,6 +67,8 @@ class Attribute:
 
 class Relationship:
     """Represents a relationship between entities"""
+
+    __slots__ = ('from_entity', 'to_entity', 'from_attribute', 'to_attribute', 'name', 'rel_type', 'comment')
     
     def __init__(self, from_entity: str, to_entity: str, 
                  from_attribute: str, to_attribute: str, 
@@ -96,28 +103,34 @@ def build_er_model(tables: Dict[str, Any]) -> Tuple[Dict[str, Entity], List[Rela
     entities = {}
     relationships = []
     
-    # Create entities and attributes
+    # 单次遍历：每个表同时创建实体和其外键关系
     for table_name, table_data in tables.items():
         entity = Entity(table_name, comment=table_data.get("comment"))
+        columns = table_data["columns"]
+        foreign_keys = table_data.get("foreign_keys", [])
 
-        # 收集外键列名
-        foreign_key_columns = set()
-        for fk in table_data.get("foreign_keys", []):
-            foreign_key_columns.add(fk["column"])
+        # 收集外键列名（每个表只构建一次，逐列判断为O(1)）
+        foreign_key_columns = frozenset(fk["column"] for fk in foreign_keys)
 
-        # 判断是否为中间表（关联表）
-        # 中间表的特征：有2个或更多外键，且大部分列都是外键或主键
-        is_junction_table = len(table_data.get("foreign_keys", [])) >= 2
+        # 按列名索引的列、主键数量、UNIQUE列，供下面的关系类型判断使用
+        col_by_name = {}
+        pk_count = 0
+        unique_cols = set()
 
         # Add attributes: 始终显示所有字段，包括外键字段
-        for col in table_data["columns"]:
-            is_foreign_key = col["name"] in foreign_key_columns
+        for col in columns:
+            col_name = col["name"]
+            col_by_name[col_name] = col
+            if col.get("pk"):
+                pk_count += 1
+            if col.get("unique"):
+                unique_cols.add(col_name)
 
             attr = Attribute(
-                name=col["name"],
+                name=col_name,
                 data_type=col.get("type", "UNKNOWN"),
                 is_pk=col.get("pk", False),
-                is_fk=is_foreign_key,
+                is_fk=col_name in foreign_key_columns,
                 comment=col.get("comment"),
                 nullable=col.get("nullable", True),
                 default=col.get("default")
@@ -125,40 +138,28 @@ def build_er_model(tables: Dict[str, Any]) -> Tuple[Dict[str, Entity], List[Rela
             entity.add_attribute(attr)
 
         entities[table_name] = entity
-    
-    # Create relationships from foreign keys
-    for table_name, table_data in tables.items():
-        for fk in table_data["foreign_keys"]:
-            # 判断关系类型
-            rel_type = '1:N'  # 默认为一对多
-            
-            # 检查外键列是否也是主键（一对一关系）
+
+        # 判断是否为中间表（关联表）
+        # 中间表的特征：有2个或更多外键，且这些外键组成复合主键
+        is_junction_table = len(foreign_keys) >= 2 and pk_count >= 2
+
+        # Create relationships from foreign keys
+        for fk in foreign_keys:
             fk_column = fk["column"]
-            is_fk_also_pk = any(col["name"] == fk_column and col["pk"] 
-                                for col in table_data["columns"])
-            
-            # 检查外键列是否有UNIQUE约束
-            is_fk_unique = any(col["name"] == fk_column and col.get("unique", False) 
-                              for col in table_data["columns"])
-            
-            if is_fk_also_pk or is_fk_unique:
-                rel_type = '1:1'
-            
-            # 检查是否是多对多关系（中间表通常有两个或更多外键，且这些外键组成复合主键）
-            if len(table_data["foreign_keys"]) >= 2:
-                # 计算主键数量
-                pk_count = sum(1 for col in table_data["columns"] if col["pk"])
-                fk_count = len(table_data["foreign_keys"])
-                
-                # 如果外键数量等于主键数量，且表只有外键列（或很少其他列），可能是中间表
-                if fk_count >= 2 and pk_count >= 2:
-                    rel_type = 'M:N'
-            
+
+            if is_junction_table:
+                rel_type = 'M:N'
+            else:
+                # 外键列同时是主键或有UNIQUE约束时为一对一，否则默认为一对多
+                fk_col = col_by_name.get(fk_column)
+                is_fk_also_pk = bool(fk_col and fk_col.get("pk"))
+                rel_type = '1:1' if is_fk_also_pk or fk_column in unique_cols else '1:N'
+
             # Create a relationship for each foreign key
             rel = Relationship(
                 from_entity=table_name,
                 to_entity=fk["ref"]["table"],
-                from_attribute=fk["column"],
+                from_attribute=fk_column,
                 to_attribute=fk["ref"]["column"] or "id",
                 rel_type=rel_type,
                 comment=fk.get("comment") # Pass relationship comment
@@ -1,94 +1,123 @@
 """
 Enhanced SQL parser with ALTER TABLE support
 """
+import json
 import re
+import sys
+from functools import lru_cache
 from typing import Dict, Any, Tuple, List
 
+_NO_TABLES_ERROR = "No CREATE TABLE statements found in the SQL."
+
+# 预编译的正则表达式，避免每次解析、每一列都重新查找/编译
+# 中文输入法的弯引号统一成SQL引号，一次translate即可完成
+_QUOTE_TABLE = str.maketrans({'\u2018': "'", '\u2019': "'", '\u201c': '"', '\u201d': '"'})
+# 注释与无关语句
+# 逐行匹配：行内含 COMMENT（不区分大小写）时跳过，否则去掉第一个 -- 及其后内容
+_LINE_COMMENT_RE = re.compile(r'^(?![^\n]*comment)([^\n]*?)--[^\n]*', re.MULTILINE | re.IGNORECASE)
+_BLOCK_COMMENT_RE = re.compile(r'/\*(?!.*COMMENT).*?\*/', re.DOTALL)
+_CREATE_DATABASE_RE = re.compile(r'CREATE\s+DATABASE[^;]*;', re.IGNORECASE)
+_USE_RE = re.compile(r'USE\s+[^;]*;', re.IGNORECASE)
+
+# CREATE TABLE 位置、表名及表注释
+_CREATE_KEYWORD_RE = re.compile(r'CREATE', re.IGNORECASE)
+_CREATE_TABLE_LOC_RE = re.compile(r'CREATE\s+TABLE', re.IGNORECASE)
+_CREATE_TABLE_NAME_RE = re.compile(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?[`"]?(\w+)[`"]?\s*\(', re.IGNORECASE)
+_TABLE_COMMENT_RE = re.compile(r"COMMENT\s*=?\s*['\"]([^'\"]*)['\"]\s*(?:;|$)", re.IGNORECASE)
+
+# 约束行判断（作用于已转为大写的行），其余部分由 _classify 用前缀比较完成
+_CONSTRAINT_PREFIX_RE = re.compile(r'CONSTRAINT\s+[`"]?\w+[`"]?\s+')
+
+# 约束内容及列定义
+_PK_COLS_RE = re.compile(r'PRIMARY\s+KEY\s*\(([^)]+)\)', re.IGNORECASE)
+_FK_REFERENCES_RE = re.compile(
+    r'FOREIGN\s+KEY\s*\(([^)]+)\)\s*REFERENCES\s+[`"]?(\w+)[`"]?\s*\(([^)]+)\)', re.IGNORECASE
+)
+_COL_DEF_RE = re.compile(r'^[`"]?(\w+)[`"]?\s+(\w+(?:\([^)]+\))?)', re.IGNORECASE)
+_COMMENT_RE = re.compile(r"COMMENT\s+['\"]([^'\"]*)['\"]", re.IGNORECASE)
+_DEFAULT_RE = re.compile(r'DEFAULT\s+([^\s,]+)', re.IGNORECASE)
+_CONSTRAINT_NAME_RE = re.compile(r'CONSTRAINT\s+[`"]?(\w+)[`"]?', re.IGNORECASE)
+
+# smart_split 需要处理的字符：括号、逗号、引号
+_SPLIT_TOKEN_RE = re.compile(r"[(),'\"]")
+
+# 原始列类型 -> 大写并驻留后的类型字符串，同一类型在所有列之间共用一个对象
+_TYPE_CACHE: Dict[str, str] = {}
+_TYPE_CACHE_SIZE = 4096
+
+# ALTER TABLE 中的外键
+_ALTER_RE = re.compile(r'ALTER\s+TABLE\s+[`"]?(\w+)[`"]?\s+(.*?)(?:;|$)', re.IGNORECASE | re.DOTALL)
+_ADD_FK_RES = (
+    re.compile(
+        r'ADD\s+CONSTRAINT\s+[`"]?\w+[`"]?\s+FOREIGN\s+KEY\s*\(([^)]+)\)\s*REFERENCES\s+[`"]?(\w+)[`"]?\s*\(([^)]+)\)',
+        re.IGNORECASE
+    ),
+    re.compile(r'ADD\s+FOREIGN\s+KEY\s*\(([^)]+)\)\s*REFERENCES\s+[`"]?(\w+)[`"]?\s*\(([^)]+)\)', re.IGNORECASE),
+)
+
 
 def parse_sql(sql: str) -> Tuple[Dict[str, Any], str]:
     """
     解析 SQL，支持 CREATE TABLE 和 ALTER TABLE ADD FOREIGN KEY
+    相同的 SQL 重复提交时直接使用缓存结果，每次返回新的可修改字典
+    """
+    tables_json, error = _parse_sql_cached(sql)
+    return json.loads(tables_json), error
+
+
+@lru_cache(maxsize=256)
+def _parse_sql_cached(sql: str) -> Tuple[str, str]:
+    """
+    缓存解析结果，表结构以JSON字符串保存，调用方修改返回值不会影响缓存
+    """
+    tables, error = _parse_sql(sql)
+    return json.dumps(tables, ensure_ascii=False), error
+
+
+def _parse_sql(sql: str) -> Tuple[Dict[str, Any], str]:
+    """
+    解析 SQL 的实际实现
     """
     try:
+        # 没有 CREATE 关键字就不可能解析出表（ALTER 只作用于已有的表），跳过整个预处理流程
+        if not _CREATE_KEYWORD_RE.search(sql):
+            return {}, _NO_TABLES_ERROR
+        
         # 标准化引号
-        sql = sql.replace(''', "'").replace(''', "'")
-        sql = sql.replace('"', '"').replace('"', '"')
+        sql = sql.translate(_QUOTE_TABLE)
         
-        # 移除注释但保留 COMMENT 内容
-        lines = []
-        for line in sql.split('\n'):
-            # 如果行中有 COMMENT 关键字，保留整行
-            if 'COMMENT' in line.upper():
-                lines.append(line)
-            else:
-                # 移除 -- 注释
-                lines.append(re.sub(r'--.*$', '', line))
-        sql = '\n'.join(lines)
+        # 移除 -- 注释，但含 COMMENT 关键字的行整行保留
+        sql = _LINE_COMMENT_RE.sub(r'\1', sql)
         
         # 移除块注释
-        sql = re.sub(r'/\*(?!.*COMMENT).*?\*/', '', sql, flags=re.DOTALL)
+        sql = _BLOCK_COMMENT_RE.sub('', sql)
         
         # 移除 CREATE DATABASE 和 USE 语句
-        sql = re.sub(r'CREATE\s+DATABASE[^;]*;', '', sql, flags=re.IGNORECASE)
-        sql = re.sub(r'USE\s+[^;]*;', '', sql, flags=re.IGNORECASE)
+        sql = _CREATE_DATABASE_RE.sub('', sql)
+        sql = _USE_RE.sub('', sql)
         
         tables = {}
         
         # 第一步：解析所有 CREATE TABLE 语句
-        # 手动查找CREATE TABLE语句，正确处理括号匹配
-        sql_upper = sql.upper()
-        pos = 0
-        
-        while True:
-            # 查找下一个CREATE TABLE
-            create_pos = sql_upper.find('CREATE TABLE', pos)
-            if create_pos == -1:
-                create_pos = sql_upper.find('CREATE  TABLE', pos)  # 处理多个空格
-            if create_pos == -1:
-                break
+        # 用不区分大小写的正则依次定位CREATE TABLE（允许多个空白），手动处理括号匹配
+        for create_match in _CREATE_TABLE_LOC_RE.finditer(sql):
+            create_pos = create_match.start()
             
             # 找到表名
-            name_match = re.search(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?[`"]?(\w+)[`"]?\s*\(', 
-                                 sql[create_pos:], re.IGNORECASE)
+            name_match = _CREATE_TABLE_NAME_RE.search(sql, create_pos)
             if not name_match:
-                pos = create_pos + 1
                 continue
             
             table_name = name_match.group(1)
             
             # 找到开始括号的位置
-            start_paren = create_pos + name_match.end() - 1
+            start_paren = name_match.end() - 1
             
-            # 匹配括号以找到结束位置
-            paren_count = 1
-            i = start_paren + 1
-            in_quote = False
-            quote_char = None
-            
-            while i < len(sql) and paren_count > 0:
-                char = sql[i]
-                
-                # 处理引号
-                if char in ("'", '"') and (i == 0 or sql[i-1] != '\\'):
-                    if not in_quote:
-                        in_quote = True
-                        quote_char = char
-                    elif char == quote_char:
-                        in_quote = False
-                        quote_char = None
-                
-                # 不在引号内时计算括号
-                if not in_quote:
-                    if char == '(':
-                        paren_count += 1
-                    elif char == ')':
-                        paren_count -= 1
-                
-                i += 1
+            # 一次扫描同时匹配括号找到结束位置，并按顶层逗号智能分割表体
+            parts, i = _scan_table_body(sql, start_paren + 1)
             
-            if paren_count == 0:
+            if parts is not None:
                 # 找到了完整的CREATE TABLE语句
-                table_content = sql[start_paren + 1:i - 1]
                 full_statement = sql[create_pos:i]
                 
                 # 查找到语句结束的分号
@@ -98,8 +127,7 @@ def parse_sql(sql: str) -> Tuple[Dict[str, Any], str]:
                 
                 # 提取表注释
                 table_comment = ''
-                comment_match = re.search(r"COMMENT\s*=?\s*['\"]([^'\"]*)['\"]\s*(?:;|$)", 
-                                        full_statement[i-create_pos:], re.IGNORECASE)
+                comment_match = _TABLE_COMMENT_RE.search(full_statement[i-create_pos:])
                 if comment_match:
                     table_comment = comment_match.group(1)
                 
@@ -108,47 +136,33 @@ def parse_sql(sql: str) -> Tuple[Dict[str, Any], str]:
                 primary_keys = []
                 foreign_keys = []
                 
-                # 智能分割
-                parts = smart_split(table_content)
-                
                 for part in parts:
                     part = part.strip()
                     if not part:
                         continue
                     
-                    upper_part = part.upper()
-                    
                     # 处理约束
-                    constraint_line = False
                     # 仅当该行以 PRIMARY/FOREIGN/UNIQUE/KEY/INDEX 或带 CONSTRAINT 开头时，视为约束行
-                    if re.match(r'^\s*(CONSTRAINT\s+[`"]?\w+[`"]?\s+)?PRIMARY\s+KEY', upper_part):
-                        constraint_line = True
-                        pk_match = re.search(r'PRIMARY\s+KEY\s*\(([^)]+)\)', part, re.IGNORECASE)
+                    kind = _classify(part.upper())
+                    if kind == 'PK':
+                        pk_match = _PK_COLS_RE.search(part)
                         if pk_match:
                             pk_cols = [col.strip().strip('`"') for col in pk_match.group(1).split(',')]
                             primary_keys.extend(pk_cols)
-                    elif re.match(r'^\s*(CONSTRAINT\s+[`"]?\w+[`"]?\s+)?FOREIGN\s+KEY', upper_part):
-                        constraint_line = True
-                        fk_match = re.search(
-                            r'FOREIGN\s+KEY\s*\(([^)]+)\)\s*REFERENCES\s+[`"]?(\w+)[`"]?\s*\(([^)]+)\)',
-                            part, re.IGNORECASE
-                        )
+                    elif kind == 'FK':
+                        fk_match = _FK_REFERENCES_RE.search(part)
                         if fk_match:
                             add_foreign_key(foreign_keys, fk_match, part)
-                    elif re.match(r'^\s*(CONSTRAINT\s+[`"]?\w+[`"]?\s+)?UNIQUE(\s+KEY)?', upper_part):
-                        constraint_line = True
-                    elif re.match(r'^\s*(KEY|INDEX)\s+', upper_part):
-                        constraint_line = True
 
-                    if constraint_line:
+                    if kind != 'COL':
                         # 对于纯约束行，处理完后跳过列解析
                         continue
 
                     # 处理列定义
-                    col_match = re.match(r'^[`"]?(\w+)[`"]?\s+(\w+(?:\([^)]+\))?)', part, re.IGNORECASE)
+                    col_match = _COL_DEF_RE.match(part)
                     if col_match:
                         col_name = col_match.group(1)
-                        col_type = col_match.group(2).upper()
+                        col_type = _canonical_type(col_match.group(2))
 
                         # 提取列属性
                         col_info = extract_column_info(part, col_name, col_type)
@@ -157,24 +171,23 @@ def parse_sql(sql: str) -> Tuple[Dict[str, Any], str]:
                         if col_info['pk']:
                             primary_keys.append(col_name)
                 
+                # 主键去重并保持声明顺序，dict 同时用于下面的成员判断
+                unique_pks = dict.fromkeys(primary_keys)
+                
                 # 确保主键标记正确
                 for col in columns:
-                    if col['name'] in primary_keys:
+                    if col['name'] in unique_pks:
                         col['pk'] = True
                 
                 tables[table_name] = {
                     'columns': columns,
-                    'primary_keys': list(set(primary_keys)),
+                    'primary_keys': list(unique_pks),
                     'foreign_keys': foreign_keys,
                     'comment': table_comment
                 }
-            
-            pos = create_pos + len(table_name) + 10  # 继续查找下一个表
         
         # 第二步：解析所有 ALTER TABLE 语句中的外键
-        alter_pattern = r'ALTER\s+TABLE\s+[`"]?(\w+)[`"]?\s+(.*?)(?:;|$)'
-        
-        for match in re.finditer(alter_pattern, sql, re.IGNORECASE | re.DOTALL):
+        for match in _ALTER_RE.finditer(sql):
             table_name = match.group(1)
             alter_content = match.group(2)
             
@@ -182,86 +195,178 @@ def parse_sql(sql: str) -> Tuple[Dict[str, Any], str]:
                 continue
             
             # 查找 ADD CONSTRAINT 或 ADD FOREIGN KEY
-            fk_patterns = [
-                r'ADD\s+CONSTRAINT\s+[`"]?\w+[`"]?\s+FOREIGN\s+KEY\s*\(([^)]+)\)\s*REFERENCES\s+[`"]?(\w+)[`"]?\s*\(([^)]+)\)',
-                r'ADD\s+FOREIGN\s+KEY\s*\(([^)]+)\)\s*REFERENCES\s+[`"]?(\w+)[`"]?\s*\(([^)]+)\)'
-            ]
-            
-            for pattern in fk_patterns:
-                for fk_match in re.finditer(pattern, alter_content, re.IGNORECASE):
+            for pattern in _ADD_FK_RES:
+                for fk_match in pattern.finditer(alter_content):
                     add_foreign_key(tables[table_name]['foreign_keys'], fk_match, alter_content)
         
         if not tables:
-            return {}, "No CREATE TABLE statements found in the SQL."
+            return {}, _NO_TABLES_ERROR
         
         return tables, ""
         
     except Exception as e:
-        # 提供更详细的错误信息
-        import traceback
-        error_detail = {
-            'message': str(e),
-            'type': type(e).__name__,
-            'traceback': traceback.format_exc()
-        }
-        
-        # 尝试提取错误位置
-        error_msg = f"解析错误: {str(e)}"
+        # 错误信息带上异常类型，便于定位；不再格式化用不到的traceback
+        error_msg = f"解析错误: {type(e).__name__}: {e}"
         if hasattr(e, 'line_number'):
             error_msg += f" (行号: {e.line_number})"
         
         return {}, error_msg
 
 
-def smart_split(content: str) -> List[str]:
-    """智能分割 SQL 内容，考虑括号嵌套"""
+def _starts_with_words(text: str, first: str, second: str) -> bool:
+    """
+    判断 text 是否以 "first 空白 second" 开头，空白可以是任意长度
+    """
+    if not text.startswith(first):
+        return False
+    rest = text[len(first):]
+    stripped = rest.lstrip()
+    return len(stripped) < len(rest) and stripped.startswith(second)
+
+
+def _classify(upper_part: str) -> str:
+    """
+    判断表定义中的一项是约束还是列，返回 'PK'/'FK'/'UNIQUE'/'KEY'/'COL'
+    upper_part 需已去除首尾空白并转为大写；只有 CONSTRAINT 前缀需要正则
+    """
+    head = upper_part
+    if head.startswith('CONSTRAINT'):
+        prefix = _CONSTRAINT_PREFIX_RE.match(head)
+        if not prefix:
+            return 'COL'
+        head = head[prefix.end():]
+    elif head.startswith(('KEY', 'INDEX')):
+        # KEY/INDEX 行不允许带 CONSTRAINT 前缀，且关键字后必须有空白
+        word_len = 3 if head[0] == 'K' else 5
+        return 'KEY' if head[word_len:word_len + 1].isspace() else 'COL'
+
+    if _starts_with_words(head, 'PRIMARY', 'KEY'):
+        return 'PK'
+    if _starts_with_words(head, 'FOREIGN', 'KEY'):
+        return 'FK'
+    if head.startswith('UNIQUE'):
+        return 'UNIQUE'
+    return 'COL'
+
+
+def _skip_quoted(text: str, quote_char: str, pos: int) -> int:
+    """
+    从引号内容的起始位置查找未被反斜杠转义的闭合引号，返回其后的位置
+    引号内的括号、逗号不逐个处理；没有闭合引号时返回文本末尾
+    """
+    while True:
+        end = text.find(quote_char, pos)
+        if end == -1:
+            return len(text)
+        if text[end-1] != '\\':
+            return end + 1
+        pos = end + 1
+
+
+def _scan_table_body(sql: str, start: int) -> Tuple[List[str], int]:
+    """
+    从 CREATE TABLE 左括号之后开始扫描，一次完成括号匹配和顶层逗号分割
+    （与 smart_split 的引号/括号规则相同），避免先找结束括号再重新扫描表体
+    返回 (各部分, 右括号之后的位置)；括号不匹配时返回 (None, len(sql))
+    """
     parts = []
-    current = ''
+    part_start = start
     depth = 0
-    in_quote = False
-    quote_char = None
+    pos = start
+    search = _SPLIT_TOKEN_RE.search
     
-    i = 0
-    while i < len(content):
-        char = content[i]
+    while True:
+        match = search(sql, pos)
+        if match is None:
+            return None, len(sql)
+        char = match.group()
+        i = match.start()
+        pos = i + 1
         
-        # 处理引号
-        if char in ("'", '"') and (i == 0 or content[i-1] != '\\'):
-            if not in_quote:
-                in_quote = True
-                quote_char = char
-            elif char == quote_char:
-                in_quote = False
-                quote_char = None
+        # 处理引号：未转义的引号直接跳到对应的闭合引号之后
+        if char == "'" or char == '"':
+            if i == 0 or sql[i-1] != '\\':
+                pos = _skip_quoted(sql, char, pos)
+            continue
         
         # 不在引号内时处理括号和逗号
-        if not in_quote:
-            if char == '(':
-                depth += 1
-            elif char == ')':
-                depth -= 1
-            elif char == ',' and depth == 0:
-                parts.append(current.strip())
-                current = ''
-                i += 1
-                continue
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            if depth == 0:
+                # 表体的结束括号
+                tail = sql[part_start:i].strip()
+                if tail:
+                    parts.append(tail)
+                return parts, i + 1
+            depth -= 1
+        elif depth == 0:
+            parts.append(sql[part_start:i].strip())
+            part_start = i + 1
+
+
+def smart_split(content: str) -> List[str]:
+    """
+    智能分割 SQL 内容，考虑括号嵌套
+    由正则直接跳到括号、逗号、引号处理，其余字符不进入 Python 循环；
+    分割点只记录位置，最后按切片取出各部分
+    """
+    parts = []
+    start = 0
+    depth = 0
+    pos = 0
+    search = _SPLIT_TOKEN_RE.search
+    
+    while True:
+        match = search(content, pos)
+        if match is None:
+            break
+        char = match.group()
+        i = match.start()
+        pos = i + 1
         
-        current += char
-        i += 1
+        # 处理引号：未转义的引号直接跳到对应的闭合引号之后
+        if char == "'" or char == '"':
+            if i == 0 or content[i-1] != '\\':
+                pos = _skip_quoted(content, char, pos)
+            continue
+        
+        # 不在引号内时处理括号和逗号
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif depth == 0:
+            parts.append(content[start:i].strip())
+            start = i + 1
     
-    if current.strip():
-        parts.append(current.strip())
+    tail = content[start:].strip()
+    if tail:
+        parts.append(tail)
     
     return parts
 
 
+def _canonical_type(raw_type: str) -> str:
+    """
+    列类型转大写，并返回缓存中共享的字符串对象，重复出现的类型不再逐列 upper()
+    """
+    col_type = _TYPE_CACHE.get(raw_type)
+    if col_type is None:
+        if len(_TYPE_CACHE) >= _TYPE_CACHE_SIZE:
+            # 类型来自用户输入，超过上限时整体清空，防止无限增长
+            _TYPE_CACHE.clear()
+        col_type = _TYPE_CACHE[raw_type] = sys.intern(raw_type.upper())
+    return col_type
+
+
 def extract_column_info(part: str, col_name: str, col_type: str) -> Dict[str, Any]:
     """提取列信息"""
     upper_part = part.upper()
     
     # 提取注释
     comment = None
-    comment_match = re.search(r"COMMENT\s+['\"]([^'\"]*)['\"]", part, re.IGNORECASE)
+    comment_match = _COMMENT_RE.search(part)
     if comment_match:
         comment = comment_match.group(1)
     
@@ -270,15 +375,20 @@ def extract_column_info(part: str, col_name: str, col_type: str) -> Dict[str, An
         'type': col_type,
         'pk': 'PRIMARY KEY' in upper_part,
         'nullable': 'NOT NULL' not in upper_part,
-        'default': extract_default(part),
+        'default': extract_default(part, upper_part),
         'comment': comment,
         'auto_increment': 'AUTO_INCREMENT' in upper_part
     }
 
 
-def extract_default(part: str) -> Any:
-    """提取默认值"""
-    default_match = re.search(r'DEFAULT\s+([^\s,]+)', part, re.IGNORECASE)
+def extract_default(part: str, upper_part: str = None) -> Any:
+    """提取默认值，upper_part 为调用方已算好的大写形式"""
+    # 大多数列没有 DEFAULT，先做一次子串查找，避免正则扫描整行
+    if upper_part is None:
+        upper_part = part.upper()
+    if 'DEFAULT' not in upper_part:
+        return None
+    default_match = _DEFAULT_RE.search(part)
     if default_match:
         value = default_match.group(1).strip("'\"")
         return value if value.upper() != 'NULL' else None
@@ -293,22 +403,26 @@ def add_foreign_key(foreign_keys: List[Dict], fk_match, content: str) -> None:
     
     # 获取约束名和注释
     constraint_name = ''
-    constraint_match = re.search(r'CONSTRAINT\s+[`"]?(\w+)[`"]?', content[:fk_match.start()], re.IGNORECASE)
+    constraint_match = _CONSTRAINT_NAME_RE.search(content, 0, fk_match.start())
     if constraint_match:
         constraint_name = constraint_match.group(1)
     
     # 获取注释
     comment = constraint_name
-    comment_match = re.search(r"COMMENT\s+['\"]([^'\"]*)['\"]", content[fk_match.start():], re.IGNORECASE)
+    comment_match = _COMMENT_RE.search(content, fk_match.start())
     if comment_match:
         comment = comment_match.group(1)
     
-    for i, local_col in enumerate(local_cols):
-        foreign_keys.append({
+    # 一次性构建所有外键记录后整体追加；被引用列不足时沿用本地列名
+    ref_count = len(ref_cols)
+    foreign_keys.extend([
+        {
             'column': local_col,
             'ref': {
                 'table': ref_table,
-                'column': ref_cols[i] if i < len(ref_cols) else local_col
+                'column': ref_cols[i] if i < ref_count else local_col
             },
             'comment': comment
-        })
\ No newline at end of file
+        }
+        for i, local_col in enumerate(local_cols)
+    ])
\ No newline at end of file
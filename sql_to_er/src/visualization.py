@@ -1,66 +1,73 @@
 """
 ER Diagram Visualization Module - Renders ER diagrams using Graphviz
 """
+import io
+import re
 import graphviz
 from typing import Dict, List, Optional
 from .er_model import Entity, Relationship
 
 
+# Double quotes that are not already backslash-escaped (same rule graphviz uses)
+_UNESCAPED_QUOTE_RE = re.compile(r'(?<!\\)"')
+
+
+def _quote(text: str) -> str:
+    """Quote a DOT identifier or label"""
+    return '"' + _UNESCAPED_QUOTE_RE.sub(r'\\"', text) + '"'
+
+
 class ERDiagramRenderer:
-    """Renders ER diagrams using Graphviz"""
+    """Renders ER diagrams using Graphviz
+
+    The DOT source is written straight into a text buffer instead of going
+    through graphviz.Digraph node/edge calls; only the final layout is
+    handed to graphviz.
+    """
     
     def __init__(self, name: str = "ER_Diagram"):
-        self.dot = graphviz.Digraph(name, format="png")
-        self.dot.attr(rankdir="TB")  # Top to bottom layout
-        self.dot.attr("node", fontname="Arial", fontsize="10")
-        self.dot.attr("edge", arrowsize="0.7", penwidth="1.2")
+        self.name = name
+        self._buf = io.StringIO()
+        write = self._buf.write
+        write(f"digraph {_quote(name)} {{\n")
+        write("\trankdir=TB\n")  # Top to bottom layout
+        write("\tnode [fontname=Arial fontsize=10]\n")
+        write("\tedge [arrowsize=0.7 penwidth=1.2]\n")
         
     def render_entities(self, entities: Dict[str, Entity]):
         """Render entities and their attributes"""
+        write = self._buf.write
         for entity_name, entity in entities.items():
+            entity_id = _quote(entity_name)
             # Create subgraph for each entity to group it with its attributes
-            with self.dot.subgraph(name=f"cluster_{entity_name}") as sub:
-                sub.attr(label="", style="invis")  # Invisible cluster
+            write(f"\tsubgraph {_quote(f'cluster_{entity_name}')} {{\n")
+            write('\t\tlabel="" style=invis\n')  # Invisible cluster
+            
+            # Entity node (rectangle)
+            write(f"\t\t{entity_id} [label={entity_id} fillcolor=lightblue shape=box style=filled]\n")
+            
+            # Attribute nodes (ellipses)
+            for attr in entity.attributes:
+                attr_id = _quote(f"{entity_name}_{attr.name}")
+                display_name = attr.get_display_name()  # 使用注释优先的显示名称
                 
-                # Entity node (rectangle)
-                sub.node(
-                    entity_name, 
-                    shape="box", 
-                    style="filled", 
-                    fillcolor="lightblue",
-                    label=entity_name
-                )
+                # Style for primary key attributes
+                if attr.is_pk:
+                    label = _quote(f"{display_name}\\n[PK]")
+                    write(
+                        f"\t\t{attr_id} [label={label} fillcolor=lightyellow "
+                        f"fontcolor=red penwidth=2 shape=ellipse style=filled]\n"
+                    )
+                else:
+                    write(f"\t\t{attr_id} [label={_quote(display_name)} fillcolor=white shape=ellipse style=filled]\n")
                 
-                # Attribute nodes (ellipses)
-                for attr in entity.attributes:
-                    attr_id = f"{entity_name}_{attr.name}"
-                    display_name = attr.get_display_name()  # 使用注释优先的显示名称
-                    
-                    # Style for primary key attributes
-                    if attr.is_pk:
-                        sub.node(
-                            attr_id,
-                            label=f"{display_name}\\n[PK]",
-                            shape="ellipse",
-                            style="filled",
-                            fillcolor="lightyellow",
-                            fontcolor="red",
-                            penwidth="2"
-                        )
-                    else:
-                        sub.node(
-                            attr_id,
-                            label=display_name,
-                            shape="ellipse",
-                            style="filled",
-                            fillcolor="white"
-                        )
-                    
-                    # Connect entity to attribute
-                    sub.edge(entity_name, attr_id, dir="none")
+                # Connect entity to attribute
+                write(f"\t\t{entity_id} -> {attr_id} [dir=none]\n")
+            write("\t}\n")
     
     def render_relationships(self, relationships: List[Relationship]):
         """Render relationships between entities"""
+        write = self._buf.write
         for i, rel in enumerate(relationships):
             rel_node = f"rel_{i}"
             
@@ -68,38 +75,27 @@ class ERDiagramRenderer:
             # 使用关系注释或生成的名称作为标签
             rel_label = rel.get_display_name() if hasattr(rel, 'get_display_name') else rel.comment or f"{rel.from_entity}_{rel.to_entity}"
             
-            self.dot.node(
-                rel_node,
-                shape="diamond",
-                style="filled",
-                fillcolor="lightgreen",
-                label=rel_label,
-                fontsize="9",
-                width="0.8",
-                height="0.6"
+            write(
+                f"\t{rel_node} [label={_quote(rel_label)} fillcolor=lightgreen fontsize=9 "
+                f"height=0.6 shape=diamond style=filled width=0.8]\n"
             )
             
             # Connect entities through relationship
             # From entity to relationship
-            self.dot.edge(
-                rel.from_entity,
-                rel_node,
-                dir="none",
-                label=f"{rel.from_attribute}"
-            )
+            write(f"\t{_quote(rel.from_entity)} -> {rel_node} [label={_quote(str(rel.from_attribute))} dir=none]\n")
             
             # From relationship to target entity
-            self.dot.edge(
-                rel_node,
-                rel.to_entity,
-                dir="none",
-                label=f"→{rel.to_attribute}"
-            )
+            write(f"\t{rel_node} -> {_quote(rel.to_entity)} [label={_quote(f'→{rel.to_attribute}')} dir=none]\n")
+    
+    @property
+    def source(self) -> str:
+        """The complete DOT source of the diagram"""
+        return self._buf.getvalue() + "}\n"
     
     def save(self, filename: str = "er_diagram", view: bool = True):
         """Save the diagram to file"""
         output_path = f"output/{filename}"
-        self.dot.render(output_path, view=view, cleanup=True)
+        graphviz.Source(self.source, format="png").render(output_path, view=view, cleanup=True)
         return f"{output_path}.png"
 
 
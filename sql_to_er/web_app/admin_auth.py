@@ -4,16 +4,39 @@
 """
 
 import bcrypt
-from flask import session, request, jsonify, redirect, url_for
+from flask import g, session, request, jsonify, redirect, url_for
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
 import pymysql
+from pymysql.constants import ER
+from dbutils.pooled_db import PooledDB
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# 管理员登录状态在session中的键，值为 [admin_id, username]，未登录时不存在
+ADMIN_SESSION_KEY = '_a'
+
 class AdminAuth:
-    def __init__(self, db_config):
+    # 验证通过的密码缓存时长（秒）及最大条目数
+    PASSWORD_CACHE_TTL = 30
+    PASSWORD_CACHE_SIZE = 1024
+
+    def __init__(self, db_config, bcrypt_rounds=10):
         self.db_config = db_config
+        # 生成密码哈希时的 bcrypt 成本因子
+        self.bcrypt_rounds = bcrypt_rounds
+        # (密码哈希, 密码sha256) -> 过期时间，短时间内重复登录时跳过bcrypt计算
+        self._password_cache = {}
+        # 数据库连接池，按进程惰性创建（见 get_db_connection）
+        self._pool = None
+        self._pool_pid = None
+        # 后台更新最后登录时间的线程池，同样按进程惰性创建
+        self._executor = None
+        self._executor_pid = None
         # 默认管理员账号（首次使用时创建）
         self.default_admin = {
             'username': 'admin',
@@ -21,8 +44,27 @@ class AdminAuth:
         }
     
     def get_db_connection(self):
-        """获取数据库连接"""
-        return pymysql.connect(
+        """
+        从连接池获取数据库连接，close() 时归还连接池而不是断开
+        gunicorn preload_app 时实例在master进程中创建，fork后的连接不能跨进程共用，
+        因此连接池按进程惰性创建
+        """
+        if self._pool is None or self._pool_pid != os.getpid():
+            # mincached=0：不预先建立连接，首次取用时才连接数据库
+            self._pool = PooledDB(
+                creator=pymysql,
+                mincached=0,
+                maxcached=10,
+                maxconnections=20,
+                blocking=True,
+                **self._connect_kwargs()
+            )
+            self._pool_pid = os.getpid()
+        return self._pool.connection()
+    
+    def _connect_kwargs(self):
+        """pymysql 连接参数"""
+        return dict(
             host=self.db_config['host'],
             user=self.db_config['user'],
             password=self.db_config['password'],
@@ -32,21 +74,23 @@ class AdminAuth:
         )
     
     def init_admin_table(self):
-        """初始化管理员相关表"""
+        """
+        初始化管理员相关表
+        应用启动时（gunicorn 预加载时在master进程中）调用，使用一次性连接而不创建连接池，
+        避免master长期占用数据库连接，也避免worker中回收继承来的连接池时关闭与master共用的socket
+        """
         conn = None
         try:
-            conn = self.get_db_connection()
+            conn = pymysql.connect(**self._connect_kwargs())
             with conn.cursor() as cursor:
-                # 为users表添加role字段（如果不存在）
-                cursor.execute("""
-                    SELECT COUNT(*) as count 
-                    FROM INFORMATION_SCHEMA.COLUMNS 
-                    WHERE TABLE_SCHEMA = %s 
-                    AND TABLE_NAME = 'users' 
-                    AND COLUMN_NAME = 'role'
-                """, (self.db_config['database'],))
-                
-                if cursor.fetchone()['count'] == 0:
+                # 常规启动时role字段已存在，直接统计管理员账号即可，只需一次往返；
+                # 仅在字段缺失（MySQL报1054 Unknown column）时才补加字段后重新统计
+                try:
+                    cursor.execute("SELECT COUNT(*) as count FROM users WHERE role = 'admin'")
+                    logger.info("Role column already exists in users table")
+                except pymysql.err.OperationalError as e:
+                    if e.args[0] != ER.BAD_FIELD_ERROR:
+                        raise
                     logger.info("Adding role column to users table...")
                     cursor.execute("""
                         ALTER TABLE users 
@@ -55,11 +99,7 @@ class AdminAuth:
                     """)
                     conn.commit()
                     logger.info("Successfully added role column to users table")
-                else:
-                    logger.info("Role column already exists in users table")
-                
-                # 检查是否已有管理员账号
-                cursor.execute("SELECT COUNT(*) as count FROM users WHERE role = 'admin'")
+                    cursor.execute("SELECT COUNT(*) as count FROM users WHERE role = 'admin'")
                 admin_count = cursor.fetchone()['count']
                 logger.info(f"Found {admin_count} admin accounts in database")
                 
@@ -68,7 +108,7 @@ class AdminAuth:
                     logger.info(f"Creating default admin account with username: {self.default_admin['username']}")
                     password_hash = bcrypt.hashpw(
                         self.default_admin['password'].encode('utf-8'), 
-                        bcrypt.gensalt()
+                        bcrypt.gensalt(rounds=self.bcrypt_rounds)
                     ).decode('utf-8')
                     
                     cursor.execute("""
@@ -115,19 +155,12 @@ class AdminAuth:
                     return False, "管理员账号已被禁用"
                 
                 # 验证密码
-                if bcrypt.checkpw(password.encode('utf-8'), admin['password_hash'].encode('utf-8')):
-                    # 更新最后登录时间
-                    cursor.execute("""
-                        UPDATE users 
-                        SET last_login_at = CURRENT_TIMESTAMP 
-                        WHERE id = %s
-                    """, (admin['id'],))
-                    conn.commit()
+                if self._check_password(password, admin['password_hash']):
+                    # 最后登录时间交给后台线程更新，登录请求不再等待第二次数据库往返
+                    self._get_executor().submit(self._touch_last_login, admin['id'])
                     
-                    # 设置session
-                    session['admin_id'] = admin['id']
-                    session['admin_username'] = admin['username']
-                    session['is_admin'] = True
+                    # 设置session：管理员状态只占一个键 [id, username]
+                    session[ADMIN_SESSION_KEY] = [admin['id'], admin['username']]
                     
                     return True, "登录成功"
                 else:
@@ -140,24 +173,70 @@ class AdminAuth:
             if conn:
                 conn.close()
     
+    def _get_executor(self):
+        """获取当前进程的后台线程池（fork后的线程不会被子进程继承）"""
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='admin-auth')
+            self._executor_pid = os.getpid()
+        return self._executor
+    
+    def _touch_last_login(self, admin_id):
+        """更新管理员最后登录时间，在后台线程中执行，失败只记录日志"""
+        conn = None
+        try:
+            conn = self.get_db_connection()
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE users 
+                    SET last_login_at = CURRENT_TIMESTAMP 
+                    WHERE id = %s
+                """, (admin_id,))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"更新管理员最后登录时间失败: {e}")
+        finally:
+            if conn:
+                conn.close()
+    
+    def _check_password(self, password, password_hash):
+        """
+        校验密码，验证通过的结果缓存一小段时间
+        缓存键包含数据库中的密码哈希，修改密码后旧缓存自然失效；验证失败不缓存
+        """
+        key = (password_hash, hashlib.sha256(password.encode('utf-8')).hexdigest())
+        now = time.monotonic()
+        expires_at = self._password_cache.get(key)
+        if expires_at is not None and expires_at > now:
+            return True
+
+        if not bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8')):
+            return False
+
+        if len(self._password_cache) >= self.PASSWORD_CACHE_SIZE:
+            # 先清理过期条目，仍然满时淘汰最早加入的一条
+            self._password_cache = {k: v for k, v in self._password_cache.items() if v > now}
+            if len(self._password_cache) >= self.PASSWORD_CACHE_SIZE:
+                self._password_cache.pop(next(iter(self._password_cache)))
+        self._password_cache[key] = now + self.PASSWORD_CACHE_TTL
+        return True
+    
     def logout(self):
         """管理员登出"""
-        session.pop('admin_id', None)
-        session.pop('admin_username', None)
-        session.pop('is_admin', None)
+        session.pop(ADMIN_SESSION_KEY, None)
     
     def is_admin_logged_in(self):
         """检查是否已登录管理员"""
-        return session.get('is_admin', False)
+        return bool(session.get(ADMIN_SESSION_KEY))
     
     def get_current_admin(self):
         """获取当前登录的管理员信息"""
-        if not self.is_admin_logged_in():
+        admin = session.get(ADMIN_SESSION_KEY)
+        if not admin:
             return None
         
         return {
-            'id': session.get('admin_id'),
-            'username': session.get('admin_username')
+            'id': admin[0],
+            'username': admin[1]
         }
 
 # 管理员权限装饰器
@@ -165,10 +244,13 @@ def admin_required(f):
     """要求管理员权限的装饰器"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if not session.get('is_admin', False):
+        admin = session.get(ADMIN_SESSION_KEY)
+        if not admin:
             if request.is_json:
                 return jsonify({'success': False, 'message': '需要管理员权限'}), 403
             else:
                 return redirect(url_for('admin.login'))
+        # 校验时顺便记下当前管理员，本次请求内不必再解析session
+        g.admin_info = {'id': admin[0], 'username': admin[1]}
         return f(*args, **kwargs)
     return decorated_function
\ No newline at end of file
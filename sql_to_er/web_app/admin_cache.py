@@ -0,0 +1,319 @@
+"""
+管理后台缓存模块
+使用Redis缓存仪表盘统计等读多写少的数据，数据变更时主动删除对应缓存
+未配置Redis或Redis不可用时直接调用数据源函数，不影响功能
+"""
+
+import os
+import json
+import logging
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 仪表盘统计数据的缓存键
+DASHBOARD_STATS_KEY = 'admin:dashboard_stats'
+# 仪表盘统计数据的缓存时长（秒）
+DASHBOARD_STATS_TTL = 60
+# 仪表盘统计数据在进程内的缓存时长（秒），命中时连Redis都不用访问；未启用Redis时也能合并短时间内的重复请求
+DASHBOARD_STATS_LOCAL_TTL = 10
+# /admin/api/stats 统计概要的进程内缓存键
+SUMMARY_STATS_KEY = 'admin:summary_stats'
+# 用户列表、公告列表按查询条件分别缓存，键前缀 + 查询参数
+USER_LIST_PREFIX = 'admin:user_list:'
+ANNOUNCEMENT_LIST_PREFIX = 'admin:announcement_list:'
+LIST_TTL = 30
+# 系统配置变更通知频道，各worker收到消息后清空进程内的配置缓存
+CONFIG_INVALIDATE_CHANNEL = 'config:invalidate'
+# 后台发送测试邮件的任务结果，供任意worker查询
+EMAIL_TASK_PREFIX = 'admin:email_task:'
+EMAIL_TASK_TTL = 300
+
+
+def _encode(o):
+    """JSON无法直接表示的类型，加上类型标记后保存，读取时还原为原类型"""
+    if isinstance(o, datetime):
+        return {'__datetime__': o.isoformat()}
+    if isinstance(o, date):
+        return {'__date__': o.isoformat()}
+    if isinstance(o, Decimal):
+        return {'__decimal__': str(o)}
+    raise TypeError(f"Object of type {type(o).__name__} is not cacheable")
+
+
+def _decode(obj):
+    """json.loads 的 object_hook，还原 _encode 标记的类型"""
+    if len(obj) == 1:
+        if '__datetime__' in obj:
+            return datetime.fromisoformat(obj['__datetime__'])
+        if '__date__' in obj:
+            return date.fromisoformat(obj['__date__'])
+        if '__decimal__' in obj:
+            return Decimal(obj['__decimal__'])
+    return obj
+
+
+def _dumps(value):
+    """序列化缓存值"""
+    return json.dumps(value, default=_encode, ensure_ascii=False, separators=(',', ':'))
+
+
+def _loads(data):
+    """反序列化缓存值，键不存在或内容无法解析时返回 None，按未命中处理"""
+    if data is None:
+        return None
+    try:
+        return json.loads(data, object_hook=_decode)
+    except ValueError as e:
+        logger.warning(f"缓存内容无法解析: {e}")
+        return None
+
+
+def _cacheable(value):
+    """数据源查询失败时返回带 failed 标记的默认数据，这类结果不写入缓存，下次请求重新查询"""
+    return not (isinstance(value, dict) and value.get('failed'))
+
+
+class AdminCache:
+    """管理后台Redis缓存"""
+
+    def __init__(self, redis_url=None):
+        self._client = None
+        # 进程内缓存 {键: (过期时间, 值)}
+        self._local = {}
+        # 各进程自己的订阅线程，键为 (频道, 进程号)
+        self._subscribers = {}
+        self._subscribe_lock = threading.Lock()
+        if not redis_url:
+            return
+        if not REDIS_AVAILABLE:
+            logger.warning("redis 未安装，管理后台缓存已禁用")
+            return
+        # from_url 不会立即建立连接；redis-py 的连接池会在fork后的子进程中自动重建
+        self._client = redis.Redis.from_url(
+            redis_url,
+            socket_timeout=0.5,
+            socket_connect_timeout=0.5
+        )
+
+    @property
+    def enabled(self):
+        """是否启用了Redis缓存"""
+        return self._client is not None
+
+    def get_or_set(self, key, ttl, fn, index=None):
+        """
+        读取缓存，未命中时调用 fn() 计算并写入缓存
+        值使用JSON序列化，datetime/Decimal 带类型标记保存，读取时还原为模板中要用到的原类型；
+        Redis出错时直接返回 fn()；fn() 返回带 failed 标记的结果时不写入缓存
+        index 为键前缀时，把键登记到该前缀的索引集合中，供 delete_prefix 批量删除
+        """
+        if self._client is None:
+            return fn()
+
+        try:
+            cached = _loads(self._client.get(key))
+        except Exception as e:
+            logger.warning(f"读取缓存失败 {key}: {e}")
+            return fn()
+        if cached is not None:
+            return cached
+
+        value = fn()
+        self.set(key, ttl, value, index)
+        return value
+
+    def get_or_set_single_flight(self, key, ttl, fn, lock_timeout=10):
+        """
+        同 get_or_set，但缓存过期时只允许一个请求重新计算，避免多个worker同时执行同一组耗时查询
+        拿到锁（SET NX EX）的请求负责计算；其他请求优先返回上一次的结果，没有旧结果时等待计算完成
+        """
+        if self._client is None:
+            return fn()
+
+        lock_key = f"{key}:lock"
+        stale_key = f"{key}:stale"
+        try:
+            cached = _loads(self._client.get(key))
+            if cached is not None:
+                return cached
+            locked = self._client.set(lock_key, '1', nx=True, ex=lock_timeout)
+        except Exception as e:
+            logger.warning(f"读取缓存失败 {key}: {e}")
+            return fn()
+
+        if locked:
+            try:
+                value = fn()
+            except Exception:
+                self.delete(lock_key)
+                raise
+            if not _cacheable(value):
+                self.delete(lock_key)
+                return value
+            try:
+                data = _dumps(value)
+                pipe = self._client.pipeline(transaction=False)
+                pipe.setex(key, ttl, data)
+                # 旧结果多保留一段时间，供重新计算期间的其他请求使用
+                pipe.setex(stale_key, ttl * 10, data)
+                pipe.delete(lock_key)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"写入缓存失败 {key}: {e}")
+            return value
+
+        # 其他请求正在计算
+        try:
+            stale = _loads(self._client.get(stale_key))
+            if stale is not None:
+                return stale
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                cached = _loads(self._client.get(key))
+                if cached is not None:
+                    return cached
+                if not self._client.exists(lock_key):
+                    break
+        except Exception as e:
+            logger.warning(f"读取缓存失败 {key}: {e}")
+        return fn()
+
+    def get_or_set_local(self, key, ttl, fn):
+        """
+        进程内缓存，不依赖Redis；未命中或过期时调用 fn() 并保存结果
+        各worker分别缓存，delete 只能清除当前进程的缓存，其他进程依靠较短的 ttl 过期
+        """
+        entry = self._local.get(key)
+        now = time.monotonic()
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        value = fn()
+        if _cacheable(value):
+            self._local[key] = (now + ttl, value)
+        return value
+
+    def get(self, key):
+        """读取缓存，不存在或出错时返回 None"""
+        if self._client is None:
+            return None
+        try:
+            return _loads(self._client.get(key))
+        except Exception as e:
+            logger.warning(f"读取缓存失败 {key}: {e}")
+            return None
+
+    def set(self, key, ttl, value, index=None):
+        """写入缓存，index 含义同 get_or_set；带 failed 标记的结果不写入"""
+        if self._client is None or not _cacheable(value):
+            return
+        try:
+            data = _dumps(value)
+            if index is None:
+                self._client.setex(key, ttl, data)
+                return
+            index_key = self._index_key(index)
+            pipe = self._client.pipeline(transaction=False)
+            pipe.setex(key, ttl, data)
+            pipe.sadd(index_key, key)
+            # 索引中的键都会在 ttl 内过期，索引本身跟着续期即可，不会无限增长
+            pipe.expire(index_key, ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"写入缓存失败 {key}: {e}")
+
+    def delete(self, *keys):
+        """删除缓存键（同时清除当前进程内的缓存）"""
+        for key in keys:
+            self._local.pop(key, None)
+        if self._client is None or not keys:
+            return
+        try:
+            self._client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"删除缓存失败 {keys}: {e}")
+
+    @staticmethod
+    def _index_key(prefix):
+        """前缀对应的索引集合键"""
+        return f"{prefix}index"
+
+    def delete_prefix(self, prefix):
+        """
+        删除指定前缀下的所有缓存键
+        只删除写入时登记在索引集合中的键，不使用会阻塞Redis的 KEYS 命令
+        """
+        if self._client is None:
+            return
+        index_key = self._index_key(prefix)
+        try:
+            keys = self._client.smembers(index_key)
+            pipe = self._client.pipeline(transaction=False)
+            if keys:
+                pipe.delete(*keys)
+            pipe.delete(index_key)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"删除缓存失败 {prefix}*: {e}")
+
+    def publish(self, channel, message=''):
+        """向频道发布消息"""
+        if self._client is None:
+            return
+        try:
+            self._client.publish(channel, message)
+        except Exception as e:
+            logger.warning(f"发布消息失败 {channel}: {e}")
+
+    def subscribe(self, channel, callback):
+        """
+        在后台线程中订阅频道，每收到一条消息调用一次 callback()
+        gunicorn 预加载应用后再fork，订阅线程按进程号在各worker中分别启动；重复调用不会重复订阅
+        """
+        if self._client is None:
+            return
+        key = (channel, os.getpid())
+        if key in self._subscribers:
+            return
+        with self._subscribe_lock:
+            if key in self._subscribers:
+                return
+            thread = threading.Thread(
+                target=self._listen, args=(channel, callback),
+                name=f'admin-cache-sub-{channel}', daemon=True
+            )
+            self._subscribers[key] = thread
+            thread.start()
+
+    def _listen(self, channel, callback):
+        """订阅循环，连接断开后稍等重连；断开期间依赖调用方的过期时间兜底"""
+        while True:
+            pubsub = None
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(channel)
+                # 重新订阅前可能漏掉了消息，先清空一次
+                callback()
+                while True:
+                    message = pubsub.get_message(timeout=30)
+                    if message is not None:
+                        callback()
+            except Exception as e:
+                logger.warning(f"订阅频道失败 {channel}: {e}")
+                time.sleep(5)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
@@ -3,16 +3,227 @@
 处理管理员相关的所有路由
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, g, render_template, request, redirect, url_for, flash, Response
 from admin_auth import AdminAuth, admin_required
+from json_response import ojson, json_loads, etag_cached, json_body
+from admin_cache import (
+    AdminCache, DASHBOARD_STATS_KEY, DASHBOARD_STATS_TTL, DASHBOARD_STATS_LOCAL_TTL,
+    SUMMARY_STATS_KEY, USER_LIST_PREFIX, ANNOUNCEMENT_LIST_PREFIX, LIST_TTL,
+    EMAIL_TASK_PREFIX, EMAIL_TASK_TTL
+)
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from werkzeug.utils import secure_filename
+import json
 import logging
+import threading
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
-def create_admin_blueprint(admin_auth, admin_stats=None, user_manager=None):
+# 测试邮件在后台线程中发送，SMTP连接慢时不占用请求处理
+EMAIL_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='admin-email')
+
+
+# 已登录的SMTP连接，键为 (host, port, username, password)，值为 (连接, 最后使用时间)
+# 连续发送测试邮件时复用连接，省去TLS握手和AUTH；使用中的连接从池中取出，避免多个线程同时使用
+_SMTP_POOL = {}
+_SMTP_POOL_LOCK = threading.Lock()
+# 空闲超过该时间（秒）的连接不再复用，服务端通常也会在几分钟内断开空闲连接
+SMTP_IDLE_TIMEOUT = 60
+
+
+def _close_smtp(server):
+    """关闭SMTP连接，忽略连接已断开等错误"""
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
+
+
+def _checkout_smtp(smtp_host, smtp_port, smtp_username, smtp_password):
+    """取出一个可用的已登录SMTP连接，没有可复用的连接时新建"""
+    import smtplib
+
+    key = (smtp_host, smtp_port, smtp_username, smtp_password)
+    now = time.monotonic()
+    expired = []
+    with _SMTP_POOL_LOCK:
+        for pool_key, (server, last_used) in list(_SMTP_POOL.items()):
+            if now - last_used > SMTP_IDLE_TIMEOUT:
+                expired.append(_SMTP_POOL.pop(pool_key)[0])
+        entry = _SMTP_POOL.pop(key, None)
+    for server in expired:
+        _close_smtp(server)
+
+    if entry is not None:
+        server = entry[0]
+        try:
+            if server.noop()[0] == 250:
+                return server
+        except Exception:
+            pass
+        _close_smtp(server)
+
+    if smtp_port == 465:
+        server = smtplib.SMTP_SSL(smtp_host, smtp_port)
+    else:
+        server = smtplib.SMTP(smtp_host, smtp_port)
+        server.starttls()
+    server.login(smtp_username, smtp_password)
+    return server
+
+
+def _checkin_smtp(smtp_host, smtp_port, smtp_username, smtp_password, server):
+    """发送成功后把连接放回池中，同一账号已有空闲连接时关闭多余的连接"""
+    key = (smtp_host, smtp_port, smtp_username, smtp_password)
+    with _SMTP_POOL_LOCK:
+        if key not in _SMTP_POOL:
+            _SMTP_POOL[key] = (server, time.monotonic())
+            return
+    _close_smtp(server)
+
+
+def _send_test_email(smtp_host, smtp_port, smtp_username, smtp_password, site_name, test_to):
+    """发送测试邮件，返回 (是否成功, 提示信息)"""
+    server = None
+    try:
+        from email.mime.text import MIMEText
+        from email.header import Header
+
+        # 构建邮件
+        message = MIMEText(f'这是一封来自 {site_name} 的测试邮件，如果您收到此邮件，说明邮件配置正确。', 'plain', 'utf-8')
+        message['From'] = Header(f'{site_name} <{smtp_username}>', 'utf-8')
+        message['To'] = Header(test_to, 'utf-8')
+        message['Subject'] = Header(f'{site_name} - 邮件配置测试', 'utf-8')
+
+        # 发送邮件
+        server = _checkout_smtp(smtp_host, smtp_port, smtp_username, smtp_password)
+        server.sendmail(smtp_username, [test_to], message.as_string())
+        _checkin_smtp(smtp_host, smtp_port, smtp_username, smtp_password, server)
+
+        return True, f'测试邮件已发送到 {test_to}'
+    except Exception as e:
+        logger.error(f"发送测试邮件失败: {e}")
+        # 出错的连接状态未知，不放回池中
+        if server is not None:
+            _close_smtp(server)
+        return False, f'发送失败: {str(e)}'
+
+
+# 创建/更新公告接口接受的字段，其他字段忽略，避免传入意外的参数
+_ANNOUNCEMENT_FIELDS = ('title', 'content', 'type', 'is_active', 'is_sticky', 'start_time', 'end_time')
+
+
+def _announcement_fields(data):
+    """从请求数据中取出公告字段，未提供的字段使用 admin_stats 方法的默认值"""
+    return {key: data[key] for key in _ANNOUNCEMENT_FIELDS if key in data}
+
+
+def _json_result(result, err_status=400):
+    """按 result['success'] 返回JSON响应和状态码"""
+    return ojson(result, 200 if result.get('success') else err_status)
+
+
+# 用户导出CSV的表头
+USER_CSV_HEADER = ('ID', '用户名', '邮箱', '余额', '累计充值', '累计消费',
+                   '邀请收益', '状态', '注册时间', '最后登录', '邀请码')
+_USER_STATUS_TEXT = {1: '正常'}
+# 流式导出时每次发送的行数
+CSV_CHUNK_SIZE = 500
+
+
+def _user_csv_row(user):
+    """把一行用户数据转换为CSV行；isoformat(' ', 'seconds') 与 strftime('%Y-%m-%d %H:%M:%S') 结果相同但更快"""
+    created_at = user['created_at']
+    last_login_at = user['last_login_at']
+    return (
+        user['id'],
+        user['username'] or '',
+        user['email'] or '',
+        f"{user['balance']:.2f}",
+        f"{user['total_recharge']:.2f}",
+        f"{user['total_consumption']:.2f}",
+        f"{user['invite_earnings']:.2f}",
+        _USER_STATUS_TEXT.get(user['status'], '禁用'),
+        created_at.isoformat(' ', 'seconds') if created_at else '',
+        last_login_at.isoformat(' ', 'seconds') if last_login_at else '',
+        user['invite_code'] or ''
+    )
+
+
+def _prefetch(rows):
+    """
+    先取出生成器的第一行，使查询在返回流式响应之前执行
+    查询失败时异常在视图中抛出，可以返回错误信息，而不是一个只有表头的文件
+    """
+    first = next(rows, None)
+    return rows if first is None else chain((first,), rows)
+
+
+# 统计报表（充值明细）CSV的表头
+REPORT_CSV_HEADER = ('订单ID', '用户ID', '用户名', '邮箱', '金额', '支付方式', '说明', '支付时间')
+
+
+def _report_csv_row(row):
+    """把一条充值记录转换为CSV行"""
+    paid_at = row['paid_at']
+    return (
+        row['id'],
+        row['user_id'],
+        row['username'] or '',
+        row['email'] or '',
+        f"{row['amount']:.2f}",
+        row['payment_method'] or '',
+        row['description'] or '',
+        paid_at.isoformat(' ', 'seconds') if paid_at else ''
+    )
+
+
+def create_admin_blueprint(admin_auth, admin_stats=None, user_manager=None, admin_cache=None):
     """创建管理员蓝图"""
     admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
     
+    # 未传入缓存时使用不连接Redis的空缓存，所有读取直接查库
+    if admin_cache is None:
+        admin_cache = AdminCache()
+    
+    def cached_dashboard_stats():
+        """仪表盘统计数据：先查进程内缓存，再查Redis，都未命中时只由一个请求重新计算"""
+        return admin_cache.get_or_set_local(
+            DASHBOARD_STATS_KEY, DASHBOARD_STATS_LOCAL_TTL,
+            lambda: admin_cache.get_or_set_single_flight(
+                DASHBOARD_STATS_KEY, DASHBOARD_STATS_TTL, admin_stats.get_dashboard_stats
+            )
+        )
+    
+    def invalidate_user_caches():
+        """用户、余额等数据变更后删除受影响的统计及用户列表缓存"""
+        admin_cache.delete(DASHBOARD_STATS_KEY, SUMMARY_STATS_KEY)
+        admin_cache.delete_prefix(USER_LIST_PREFIX)
+    
+    def invalidate_announcement_caches():
+        """公告变更后删除公告列表缓存"""
+        admin_cache.delete_prefix(ANNOUNCEMENT_LIST_PREFIX)
+    
+    def announcement_write_result(result):
+        """公告写操作的统一返回：成功时删除公告列表缓存"""
+        if result.get('success'):
+            invalidate_announcement_caches()
+        return _json_result(result)
+    
+    def save_email_task(task_id, result):
+        """保存测试邮件任务状态（仅启用Redis时使用，任意worker都能查询）"""
+        admin_cache.set(f"{EMAIL_TASK_PREFIX}{task_id}", EMAIL_TASK_TTL, result)
+    
+    def load_email_task(task_id):
+        """读取测试邮件任务状态，不存在时返回 None"""
+        return admin_cache.get(f"{EMAIL_TASK_PREFIX}{task_id}")
+    
     @admin_bp.route('/login', methods=['GET', 'POST'])
     def login():
         """管理员登录"""
@@ -49,11 +260,11 @@ def create_admin_blueprint(admin_auth, admin_stats=None, user_manager=None):
     @admin_required
     def dashboard():
         """管理员仪表盘"""
-        admin_info = admin_auth.get_current_admin()
+        admin_info = g.admin_info
         
         # 获取统计数据
         if admin_stats:
-            stats = admin_stats.get_dashboard_stats()
+            stats = cached_dashboard_stats()
         else:
             # 空数据
             stats = {
@@ -71,23 +282,37 @@ def create_admin_blueprint(admin_auth, admin_stats=None, user_manager=None):
     @admin_required
     def users():
         """用户管理"""
-        admin_info = admin_auth.get_current_admin()
+        admin_info = g.admin_info
         
         # 获取查询参数
         page = request.args.get('page', 1, type=int)
         search = request.args.get('search', '').strip()
         status = request.args.get('status', type=int)
+        # 下一页链接带上游标（上一页最后的用户id），避免 OFFSET 扫描
+        cursor = request.args.get('cursor', type=int)
         
         # 获取用户列表
         if admin_stats:
-            user_data = admin_stats.get_user_list(page=page, search=search, status=status)
+            # 同一组筛选条件的总数在服务端单独缓存，翻页时不必重复 COUNT；用户变更时随列表缓存一起删除
+            count_key = f"{USER_LIST_PREFIX}count:{search}:{status}"
+            total = admin_cache.get(count_key)
+            user_data = admin_cache.get_or_set(
+                f"{USER_LIST_PREFIX}{page}:{cursor}:{search}:{status}", LIST_TTL,
+                lambda: admin_stats.get_user_list(page=page, search=search, status=status,
+                                                  after_id=cursor, total=total),
+                index=USER_LIST_PREFIX
+            )
+            if total is None and not user_data.get('failed'):
+                admin_cache.set(count_key, LIST_TTL, user_data.get('total', 0), index=USER_LIST_PREFIX)
         else:
             user_data = {
                 'users': [],
                 'total': 0,
                 'page': page,
                 'per_page': 20,
-                'total_pages': 0
+                'total_pages': 0,
+                'has_next': False,
+                'next_cursor': None
             }
         
         return render_template('admin/users.html', 
@@ -100,7 +325,7 @@ def create_admin_blueprint(admin_auth, admin_stats=None, user_manager=None):
     @admin_required
     def announcements():
         """公告管理"""
-        admin_info = admin_auth.get_current_admin()
+        admin_info = g.admin_info
         
         # 获取查询参数
         page = request.args.get('page', 1, type=int)
@@ -111,14 +336,26 @@ def create_admin_blueprint(admin_auth, admin_stats=None, user_manager=None):
         
         # 获取公告列表
         if admin_stats:
-            announcement_data = admin_stats.get_announcement_list(page=page, search=search, type_filter=type_filter, status_filter=status_filter)
+            # 同一组筛选条件的总数在服务端单独缓存，翻页时不必重复 COUNT；公告变更时随列表缓存一起删除
+            count_key = f"{ANNOUNCEMENT_LIST_PREFIX}count:{type_filter}:{status_filter}:{search}"
+            total = admin_cache.get(count_key)
+            announcement_data = admin_cache.get_or_set(
+                f"{ANNOUNCEMENT_LIST_PREFIX}{page}:{type_filter}:{status_filter}:{search}", LIST_TTL,
+                lambda: admin_stats.get_announcement_list(page=page, search=search, type_filter=type_filter,
+                                                          status_filter=status_filter, total=total),
+                index=ANNOUNCEMENT_LIST_PREFIX
+            )
             announcements = announcement_data.get('announcements', [])
+            if total is None and not announcement_data.get('failed'):
+                admin_cache.set(count_key, LIST_TTL, announcement_data.get('total', 0), index=ANNOUNCEMENT_LIST_PREFIX)
             total = announcement_data.get('total', 0)
             total_pages = announcement_data.get('total_pages', 0)
+            has_next = announcement_data.get('has_next', False)
         else:
             announcements = []
             total = 0
             total_pages = 0
+            has_next = False
         
         return render_template('admin/announcements.html', 
                              admin_info=admin_info,
@@ -126,6 +363,7 @@ def create_admin_blueprint(admin_auth, admin_stats=None, user_manager=None):
                              page=page,
                              total=total,
                              total_pages=total_pages,
+                             has_next=has_next,
                              search=search,
                              type_filter=type_filter,
                              status_filter=status_filter)
@@ -134,14 +372,14 @@ def create_admin_blueprint(admin_auth, admin_stats=None, user_manager=None):
     @admin_required
     def statistics():
         """数据统计"""
-        admin_info = admin_auth.get_current_admin()
+        admin_info = g.admin_info
         return render_template('admin/statistics.html', admin_info=admin_info)
     
     @admin_bp.route('/settings')
     @admin_required
     def settings():
         """系统设置"""
-        admin_info = admin_auth.get_current_admin()
+        admin_info = g.admin_info
         
         # 获取系统配置
         if admin_stats:
@@ -154,28 +392,16 @@ def create_admin_blueprint(admin_auth, admin_stats=None, user_manager=None):
     # API路由
     @admin_bp.route('/api/stats')
     @admin_required
+    @etag_cached(15)
     def api_stats():
         """获取统计数据API"""
         if admin_stats:
-            stats = admin_stats.get_dashboard_stats()
-            # 确保stats包含所需的键
-            if stats and 'users' in stats and 'finance' in stats and 'activity' in stats:
-                return jsonify({
-                    'success': True,
-                    'data': {
-                        'total_users': stats['users']['total_users'],
-                        'total_revenue': stats['finance']['total_revenue'],
-                        'today_users': stats['users']['today_new_users'],
-                        'today_revenue': stats['finance']['today_revenue'],
-                        'active_users': stats['users']['active_users'],
-                        'online_users': stats['activity']['online_users']
-                    }
-                })
-        
-        # 返回默认数据
-        return jsonify({
-            'success': True,
-            'data': {
+            data = admin_cache.get_or_set_local(
+                SUMMARY_STATS_KEY, DASHBOARD_STATS_LOCAL_TTL, admin_stats.get_summary_stats
+            )
+        else:
+            # 返回默认数据
+            data = {
                 'total_users': 0,
                 'total_revenue': 0,
                 'today_users': 0,
@@ -183,59 +409,62 @@ def create_admin_blueprint(admin_auth, admin_stats=None, user_manager=None):
                 'active_users': 0,
                 'online_users': 0
             }
-        })
+        return ojson({'success': True, 'data': data})
     
     @admin_bp.route('/api/users/<int:user_id>/status', methods=['POST'])
     @admin_required
+    @json_body
     def update_user_status(user_id):
         """更新用户状态"""
         if not user_manager:
-            return jsonify({'success': False, 'message': '功能未启用'}), 400
+            return ojson({'success': False, 'message': '功能未启用'}, 400)
         
-        data = request.get_json()
+        data = g.json_body
         status = data.get('status')
         
         if status not in [0, 1]:
-            return jsonify({'success': False, 'message': '无效的状态值'}), 400
+            return ojson({'success': False, 'message': '无效的状态值'}, 400)
         
         # 更新用户状态
         success = user_manager.update_user_status(user_id, status)
         
         if success:
-            return jsonify({'success': True, 'message': '状态更新成功'})
+            invalidate_user_caches()
+            return ojson({'success': True, 'message': '状态更新成功'})
         else:
-            return jsonify({'success': False, 'message': '更新失败'}), 400
+            return ojson({'success': False, 'message': '更新失败'}, 400)
     
     @admin_bp.route('/api/users/<int:user_id>/detail')
     @admin_required
     def get_user_detail(user_id):
         """获取用户详细信息"""
         if not admin_stats:
-            return jsonify({'success': False, 'message': '功能未启用'}), 400
+            return ojson({'success': False, 'message': '功能未启用'}, 400)
         
         user = admin_stats.get_user_detail(user_id)
         if user:
-            return jsonify({'success': True, 'user': user})
+            return ojson({'success': True, 'user': user})
         else:
-            return jsonify({'success': False, 'message': '用户不存在'}), 404
+            return ojson({'success': False, 'message': '用户不存在'}, 404)
     
     @admin_bp.route('/api/users/<int:user_id>/recharge', methods=['POST'])
     @admin_required
+    @json_body
     def recharge_user(user_id):
         """管理员给用户充值"""
         if not user_manager:
-            return jsonify({'success': False, 'message': '功能未启用'}), 400
+            return ojson({'success': False, 'message': '功能未启用'}, 400)
         
-        data = request.get_json()
+        data = g.json_body
         amount = data.get('amount', 0)
         description = data.get('description', '管理员手动充值')
         
         if amount <= 0:
-            return jsonify({'success': False, 'message': '充值金额必须大于0'}), 400
+            return ojson({'success': False, 'message': '充值金额必须大于0'}, 400)
         
         # 获取当前管理员ID
-        admin_info = admin_auth.get_current_admin()
-        admin_id = admin_info.get('id') if admin_info else None
+        admin_info = g.admin_info
+        admin_id = admin_info['id']
         
         success = user_manager.add_balance(
             user_id=user_id,
@@ -246,88 +475,85 @@ def create_admin_blueprint(admin_auth, admin_stats=None, user_manager=None):
         )
         
         if success:
-            return jsonify({'success': True, 'message': '充值成功'})
+            invalidate_user_caches()
+            return ojson({'success': True, 'message': '充值成功'})
         else:
-            return jsonify({'success': False, 'message': '充值失败'}), 400
+            return ojson({'success': False, 'message': '充值失败'}, 400)
     
     @admin_bp.route('/api/users/add', methods=['POST'])
     @admin_required
+    @json_body
     def add_user():
         """管理员添加新用户"""
         if not user_manager:
-            return jsonify({'success': False, 'message': '功能未启用'}), 400
+            return ojson({'success': False, 'message': '功能未启用'}, 400)
         
-        data = request.get_json()
+        data = g.json_body
         username = data.get('username', '').strip()
         email = data.get('email', '').strip()
         password = data.get('password', '')
         balance = data.get('balance', 0)
         
         if not password:
-            return jsonify({'success': False, 'message': '密码不能为空'}), 400
+            return ojson({'success': False, 'message': '密码不能为空'}, 400)
         
         if not username and not email:
-            return jsonify({'success': False, 'message': '请至少提供用户名或邮箱'}), 400
+            return ojson({'success': False, 'message': '请至少提供用户名或邮箱'}, 400)
         
-        # 注册用户
-        result = user_manager.register_user(
+        # 创建用户并设置初始余额（同一事务）
+        result = user_manager.register_user_with_balance(
             username=username or None,
             email=email or None,
-            password=password
+            password=password,
+            balance=balance,
+            operator_id=g.admin_info['id'],
+            description='管理员设置初始余额',
+            method='admin'
         )
         
         if result['success']:
-            # 如果需要设置初始余额
-            if balance > 0:
-                admin_info = admin_auth.get_current_admin()
-                admin_id = admin_info.get('id') if admin_info else None
-                
-                user_manager.add_balance(
-                    user_id=result['user_id'],
-                    amount=balance,
-                    operator_id=admin_id,
-                    description='管理员设置初始余额',
-                    method='admin'
-                )
+            invalidate_user_caches()
             
-            return jsonify({
+            return ojson({
                 'success': True,
                 'message': '用户添加成功',
                 'user_id': result['user_id']
             })
         else:
-            return jsonify({
+            return ojson({
                 'success': False,
                 'message': result['message']
-            }), 400
+            }, 400)
     
     @admin_bp.route('/api/config/update', methods=['POST'])
     @admin_required
+    @json_body
     def update_config():
         """更新系统配置"""
         if not admin_stats:
-            return jsonify({'success': False, 'message': '功能未启用'}), 400
+            return ojson({'success': False, 'message': '功能未启用'}, 400)
         
-        data = request.get_json()
+        data = g.json_body
         config_key = data.get('key')
         config_value = data.get('value')
         
         if not config_key or config_value is None:
-            return jsonify({'success': False, 'message': '参数不完整'}), 400
+            return ojson({'success': False, 'message': '参数不完整'}, 400)
         
         success = admin_stats.update_system_config(config_key, config_value)
         
         if success:
-            return jsonify({'success': True, 'message': '配置更新成功'})
+            return ojson({'success': True, 'message': '配置更新成功'})
         else:
-            return jsonify({'success': False, 'message': '更新失败'}), 400
+            return ojson({'success': False, 'message': '更新失败'}, 400)
     
     @admin_bp.route('/api/statistics')
     @admin_required
+    @etag_cached(15)
     def api_statistics():
         """获取详细统计数据API"""
         if not admin_stats:
-            return jsonify({'success': False, 'message': '统计功能未启用'}), 400
+            return ojson({'success': False, 'message': '统计功能未启用'}, 400)
         
         # 获取查询参数
         time_range = request.args.get('range', '7days')
@@ -337,244 +563,265 @@ def create_admin_blueprint(admin_auth, admin_stats=None, user_manager=None):
         # 获取统计数据
         result = admin_stats.get_detailed_statistics(time_range, start_date, end_date)
         
-        return jsonify(result)
+        return ojson(result)
     
     @admin_bp.route('/api/export-report')
     @admin_required
     def export_report():
-        """导出统计报表"""
-        # 获取参数
+        """导出统计报表（充值明细CSV，边查询边发送）"""
+        if not admin_stats:
+            return ojson({'success': False, 'message': '统计功能未启用'}, 400)
+        
+        import csv
+        import io
+        
+        # 获取参数；format=excel 同样导出CSV，带BOM以便Excel正确识别中文
         time_range = request.args.get('range', '7days')
-        format_type = request.args.get('format', 'excel')
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
         
-        # TODO: 实现报表导出功能
-        # 这里暂时返回提示信息
-        return jsonify({
-            'success': False,
-            'message': '报表导出功能正在开发中'
-        })
+        try:
+            rows = _prefetch(admin_stats.iter_report_rows(time_range, start_date, end_date))
+        except Exception:
+            return ojson({'success': False, 'message': '导出失败'}, 500)
+        
+        def generate():
+            output = io.StringIO()
+            writer = csv.writer(output)
+            
+            output.write('\ufeff')
+            writer.writerow(REPORT_CSV_HEADER)
+            yield output.getvalue()
+            
+            while True:
+                chunk = list(islice(rows, CSV_CHUNK_SIZE))
+                if not chunk:
+                    break
+                output.seek(0)
+                output.truncate()
+                writer.writerows(map(_report_csv_row, chunk))
+                yield output.getvalue()
+        
+        return Response(
+            generate(),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename=report_{secure_filename(time_range)}.csv'}
+        )
     
     # 公告管理API路由
-    @admin_bp.route('/api/announcements', methods=['GET'])
-    @admin_required
+    @etag_cached()
     def api_get_admin_announcements():
         """获取公告列表（管理端）"""
         # 这个接口用于管理端获取所有公告，包括禁用的
         # 与前台API不同，这里不过滤时间和状态
-        return jsonify({
+        return ojson({
             'success': True,
             'announcements': []
         })
     
-    @admin_bp.route('/api/announcements', methods=['POST'])
-    @admin_required
+    @json_body
     def api_create_announcement():
         """创建新公告"""
         if not admin_stats:
-            return jsonify({'success': False, 'message': '功能未启用'}), 400
-        
-        data = request.get_json()
-        admin_info = admin_auth.get_current_admin()
-        
-        result = admin_stats.create_announcement(
-            title=data.get('title'),
-            content=data.get('content'),
-            type=data.get('type', 'info'),
-            is_active=data.get('is_active', 1),
-            is_sticky=data.get('is_sticky', 0),
-            start_time=data.get('start_time'),
-            end_time=data.get('end_time'),
-            admin_id=admin_info.get('id')
-        )
+            return ojson({'success': False, 'message': '功能未启用'}, 400)
         
-        if result['success']:
-            return jsonify(result)
-        else:
-            return jsonify(result), 400
+        data = g.json_body
+        if not data.get('title') or not data.get('content'):
+            return ojson({'success': False, 'message': '标题和内容不能为空'}, 400)
+        
+        return announcement_write_result(admin_stats.create_announcement(
+            admin_id=g.admin_info['id'], **_announcement_fields(data)
+        ))
     
-    @admin_bp.route('/api/announcements/<int:announcement_id>', methods=['GET'])
-    @admin_required
+    @etag_cached()
     def api_get_announcement(announcement_id):
         """获取公告详情"""
         if not admin_stats:
-            return jsonify({'success': False, 'message': '功能未启用'}), 400
+            return ojson({'success': False, 'message': '功能未启用'}, 400)
         
         announcement = admin_stats.get_announcement_detail(announcement_id)
         if announcement:
-            return jsonify({'success': True, 'data': announcement})
+            return ojson({'success': True, 'data': announcement})
         else:
-            return jsonify({'success': False, 'message': '公告不存在'}), 404
+            return ojson({'success': False, 'message': '公告不存在'}, 404)
     
-    @admin_bp.route('/api/announcements/<int:announcement_id>', methods=['PUT'])
-    @admin_required
+    @json_body
     def api_update_announcement(announcement_id):
         """更新公告"""
         if not admin_stats:
-            return jsonify({'success': False, 'message': '功能未启用'}), 400
-        
-        data = request.get_json()
-        result = admin_stats.update_announcement(
-            announcement_id=announcement_id,
-            title=data.get('title'),
-            content=data.get('content'),
-            type=data.get('type'),
-            is_active=data.get('is_active'),
-            is_sticky=data.get('is_sticky'),
-            start_time=data.get('start_time'),
-            end_time=data.get('end_time')
-        )
+            return ojson({'success': False, 'message': '功能未启用'}, 400)
         
-        if result['success']:
-            return jsonify(result)
-        else:
-            return jsonify(result), 400
+        data = g.json_body
+        return announcement_write_result(
+            admin_stats.update_announcement(announcement_id, **_announcement_fields(data))
+        )
     
     @admin_bp.route('/api/announcements/<int:announcement_id>/status', methods=['PUT'])
     @admin_required
+    @json_body
     def api_toggle_announcement_status(announcement_id):
         """切换公告状态"""
         if not admin_stats:
-            return jsonify({'success': False, 'message': '功能未启用'}), 400
+            return ojson({'success': False, 'message': '功能未启用'}, 400)
         
-        data = request.get_json()
-        is_active = data.get('is_active', 0)
-        
-        result = admin_stats.update_announcement_status(announcement_id, is_active)
-        if result['success']:
-            return jsonify(result)
-        else:
-            return jsonify(result), 400
+        data = g.json_body
+        return announcement_write_result(
+            admin_stats.update_announcement_status(announcement_id, data.get('is_active', 0))
+        )
     
-    @admin_bp.route('/api/announcements/<int:announcement_id>', methods=['DELETE'])
-    @admin_required
     def api_delete_announcement(announcement_id):
         """删除公告"""
         if not admin_stats:
-            return jsonify({'success': False, 'message': '功能未启用'}), 400
+            return ojson({'success': False, 'message': '功能未启用'}, 400)
         
-        result = admin_stats.delete_announcement(announcement_id)
-        if result['success']:
-            return jsonify(result)
-        else:
-            return jsonify(result), 400
+        return announcement_write_result(admin_stats.delete_announcement(announcement_id))
     
+    # 同一URL的不同方法注册为一条URL规则，在视图中按请求方法分发
+    @admin_bp.route('/api/announcements', methods=['GET', 'POST'])
+    @admin_required
+    def api_announcements():
+        """公告列表（GET）/ 创建公告（POST）"""
+        if request.method == 'POST':
+            return api_create_announcement()
+        return api_get_admin_announcements()
+    
+    @admin_bp.route('/api/announcements/<int:announcement_id>', methods=['GET', 'PUT', 'DELETE'])
+    @admin_required
+    def api_announcement(announcement_id):
+        """公告详情（GET）/ 更新公告（PUT）/ 删除公告（DELETE）"""
+        if request.method == 'PUT':
+            return api_update_announcement(announcement_id)
+        if request.method == 'DELETE':
+            return api_delete_announcement(announcement_id)
+        return api_get_announcement(announcement_id)
+
     @admin_bp.route('/api/users/<int:user_id>/edit', methods=['POST'])
     @admin_required
+    @json_body
     def edit_user(user_id):
         """编辑用户信息"""
         if not user_manager:
-            return jsonify({'success': False, 'message': '功能未启用'}), 400
+            return ojson({'success': False, 'message': '功能未启用'}, 400)
 
-        data = request.get_json()
+        data = g.json_body
         username = data.get('username')
         email = data.get('email')
         password = data.get('password')
 
         result = user_manager.update_user_info(user_id, username, email, password)
         if result['success']:
-            return jsonify(result)
+            invalidate_user_caches()
+            return ojson(result)
         else:
-            return jsonify(result), 400
+            return ojson(result, 400)
 
     @admin_bp.route('/api/users/<int:user_id>/delete', methods=['DELETE'])
     @admin_required
     def delete_user(user_id):
         """删除用户"""
         if not user_manager:
-            return jsonify({'success': False, 'message': '功能未启用'}), 400
+            return ojson({'success': False, 'message': '功能未启用'}, 400)
 
         result = user_manager.delete_user(user_id)
         if result['success']:
-            return jsonify(result)
+            invalidate_user_caches()
+            return ojson(result)
         else:
-            return jsonify(result), 400
+            return ojson(result, 400)
 
     @admin_bp.route('/api/users/<int:user_id>/reset-password', methods=['POST'])
     @admin_required
+    @json_body
     def reset_user_password(user_id):
         """重置用户密码"""
         if not user_manager:
-            return jsonify({'success': False, 'message': '功能未启用'}), 400
+            return ojson({'success': False, 'message': '功能未启用'}, 400)
 
-        data = request.get_json()
+        data = g.json_body
         new_password = data.get('password', '')
 
         result = user_manager.reset_user_password(user_id, new_password)
         if result['success']:
-            return jsonify(result)
+            invalidate_user_caches()
+            return ojson(result)
         else:
-            return jsonify(result), 400
+            return ojson(result, 400)
 
     @admin_bp.route('/api/users/<int:user_id>/role', methods=['POST'])
     @admin_required
+    @json_body
     def update_user_role(user_id):
         """更新用户角色"""
         if not user_manager:
-            return jsonify({'success': False, 'message': '功能未启用'}), 400
+            return ojson({'success': False, 'message': '功能未启用'}, 400)
 
-        data = request.get_json()
+        data = g.json_body
         new_role = data.get('role', 'user')
 
         result = user_manager.update_user_role(user_id, new_role)
         if result['success']:
-            return jsonify(result)
+            invalidate_user_caches()
+            return ojson(result)
         else:
-            return jsonify(result), 400
+            return ojson(result, 400)
 
     @admin_bp.route('/api/users/<int:user_id>/transactions')
     @admin_required
     def get_user_transactions(user_id):
         """获取用户交易记录"""
         if not user_manager:
-            return jsonify({'success': False, 'message': '功能未启用'}), 400
+            return ojson({'success': False, 'message': '功能未启用'}, 400)
 
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
 
         result = user_manager.get_user_transactions(user_id, page, per_page)
-        return jsonify({'success': True, 'data': result})
+        return ojson({'success': True, 'data': result})
 
     @admin_bp.route('/api/users/batch/status', methods=['POST'])
     @admin_required
+    @json_body
     def batch_update_user_status():
         """批量更新用户状态"""
         if not user_manager:
-            return jsonify({'success': False, 'message': '功能未启用'}), 400
+            return ojson({'success': False, 'message': '功能未启用'}, 400)
 
-        data = request.get_json()
+        data = g.json_body
         user_ids = data.get('user_ids', [])
         status = data.get('status', 0)
 
         result = user_manager.batch_update_status(user_ids, status)
         if result['success']:
-            return jsonify(result)
+            invalidate_user_caches()
+            return ojson(result)
         else:
-            return jsonify(result), 400
+            return ojson(result, 400)
 
     @admin_bp.route('/api/users/batch/delete', methods=['POST'])
     @admin_required
+    @json_body
     def batch_delete_users():
         """批量删除用户"""
         if not user_manager:
-            return jsonify({'success': False, 'message': '功能未启用'}), 400
+            return ojson({'success': False, 'message': '功能未启用'}, 400)
 
-        data = request.get_json()
+        data = g.json_body
         user_ids = data.get('user_ids', [])
 
         result = user_manager.batch_delete_users(user_ids)
         if result['success']:
-            return jsonify(result)
+            invalidate_user_caches()
+            return ojson(result)
         else:
-            return jsonify(result), 400
+            return ojson(result, 400)
 
     @admin_bp.route('/api/users/export')
     @admin_required
     def export_users():
         """导出用户列表"""
         if not user_manager:
-            return jsonify({'success': False, 'message': '功能未启用'}), 400
+            return ojson({'success': False, 'message': '功能未启用'}, 400)
 
-        from flask import Response
         import csv
         import io
 
@@ -589,7 +836,7 @@ def create_admin_blueprint(admin_auth, admin_stats=None, user_manager=None):
         sort_order = request.args.get('sort_order', 'DESC')
         export_format = request.args.get('format', 'csv')
 
-        users = user_manager.export_users(
+        filters = dict(
             search=search if search else None,
             status=status,
             date_start=date_start if date_start else None,
@@ -601,66 +848,69 @@ def create_admin_blueprint(admin_auth, admin_stats=None, user_manager=None):
         )
 
         if export_format == 'csv':
-            # 生成CSV
-            output = io.StringIO()
-            writer = csv.writer(output)
+            # 边查询边生成CSV，每行写完立即发送，不在内存中拼接整个文件
+            try:
+                users = _prefetch(user_manager.iter_export_users(**filters))
+            except Exception:
+                return ojson({'success': False, 'message': '导出失败'}, 500)
+
+            def generate():
+                output = io.StringIO()
+                writer = csv.writer(output)
+
+                # 写入表头
+                writer.writerow(USER_CSV_HEADER)
+                yield output.getvalue()
+
+                # 写入数据，每 CSV_CHUNK_SIZE 行交给 writerows 一次写完再发送，循环在csv模块的C代码中进行
+                while True:
+                    chunk = list(islice(users, CSV_CHUNK_SIZE))
+                    if not chunk:
+                        break
+                    output.seek(0)
+                    output.truncate()
+                    writer.writerows(map(_user_csv_row, chunk))
+                    yield output.getvalue()
 
-            # 写入表头
-            writer.writerow(['ID', '用户名', '邮箱', '余额', '累计充值', '累计消费',
-                           '邀请收益', '状态', '注册时间', '最后登录', '邀请码'])
-
-            # 写入数据
-            for user in users:
-                writer.writerow([
-                    user['id'],
-                    user['username'] or '',
-                    user['email'] or '',
-                    f"{user['balance']:.2f}",
-                    f"{user['total_recharge']:.2f}",
-                    f"{user['total_consumption']:.2f}",
-                    f"{user['invite_earnings']:.2f}",
-                    '正常' if user['status'] == 1 else '禁用',
-                    user['created_at'].strftime('%Y-%m-%d %H:%M:%S') if user['created_at'] else '',
-                    user['last_login_at'].strftime('%Y-%m-%d %H:%M:%S') if user['last_login_at'] else '',
-                    user['invite_code'] or ''
-                ])
-
-            output.seek(0)
             return Response(
-                output.getvalue(),
+                generate(),
                 mimetype='text/csv',
                 headers={'Content-Disposition': 'attachment; filename=users_export.csv'}
             )
         else:
             # 返回JSON
-            return jsonify({'success': True, 'data': users})
+            users = user_manager.export_users(**filters)
+            return ojson({'success': True, 'data': users})
 
     # ============ 系统设置相关 API ============
 
     @admin_bp.route('/api/system/info')
     @admin_required
+    @etag_cached()
     def get_system_info():
         """获取系统信息"""
         result = admin_stats.get_system_info()
-        return jsonify(result)
+        return ojson(result)
 
     @admin_bp.route('/api/system/clear-logs', methods=['POST'])
     @admin_required
+    @json_body
     def clear_logs():
         """清理日志"""
-        data = request.get_json() or {}
+        data = g.json_body
         days = data.get('days', 30)
         result = admin_stats.clear_logs(days=int(days))
-        return jsonify(result)
+        return ojson(result)
 
     @admin_bp.route('/api/system/clear-expired', methods=['POST'])
     @admin_required
+    @json_body
     def clear_expired_data():
         """清理过期数据"""
-        data = request.get_json() or {}
+        data = g.json_body
         days = data.get('days', 90)
         result = admin_stats.clear_expired_data(days=int(days))
-        return jsonify(result)
+        return ojson(result)
 
     @admin_bp.route('/api/config/export')
     @admin_required
@@ -673,7 +923,7 @@ def create_admin_blueprint(admin_auth, admin_stats=None, user_manager=None):
                 mimetype='application/json',
                 headers={'Content-Disposition': 'attachment; filename=system_config.json'}
             )
-        return jsonify(result)
+        return ojson(result)
 
     @admin_bp.route('/api/config/import', methods=['POST'])
     @admin_required
@@ -682,39 +932,36 @@ def create_admin_blueprint(admin_auth, admin_stats=None, user_manager=None):
         try:
             if 'file' in request.files:
                 file = request.files['file']
-                config_data = json.load(file)
+                config_data = json_loads(file.read())
             else:
-                config_data = request.get_json()
+                config_data = request.get_json(cache=False)
 
             result = admin_stats.import_config(config_data)
-            return jsonify(result)
+            return ojson(result)
         except json.JSONDecodeError:
-            return jsonify({'success': False, 'message': '无效的JSON格式'})
+            return ojson({'success': False, 'message': '无效的JSON格式'})
         except Exception as e:
-            return jsonify({'success': False, 'message': str(e)})
+            return ojson({'success': False, 'message': str(e)})
 
     @admin_bp.route('/api/config/reset', methods=['POST'])
     @admin_required
     def reset_config():
         """重置配置为默认值"""
         result = admin_stats.reset_config_to_default()
-        return jsonify(result)
+        return ojson(result)
 
     @admin_bp.route('/api/system/test-email', methods=['POST'])
     @admin_required
+    @json_body
     def test_email():
         """测试邮件发送"""
-        data = request.get_json() or {}
+        data = g.json_body
         test_to = data.get('email', '')
 
         if not test_to:
-            return jsonify({'success': False, 'message': '请输入测试邮箱地址'})
+            return ojson({'success': False, 'message': '请输入测试邮箱地址'})
 
         try:
-            import smtplib
-            from email.mime.text import MIMEText
-            from email.header import Header
-
             # 获取配置
             configs = admin_stats.get_system_config()
             smtp_host = configs.get('smtp_host', {}).get('value', 'smtp.qq.com')
@@ -722,34 +969,47 @@ def create_admin_blueprint(admin_auth, admin_stats=None, user_manager=None):
             smtp_username = configs.get('smtp_username', {}).get('value', '')
             smtp_password = configs.get('smtp_password', {}).get('value', '')
             site_name = configs.get('site_name', {}).get('value', '智能文档处理平台')
+        except Exception as e:
+            logger.error(f"读取邮件配置失败: {e}")
+            return ojson({'success': False, 'message': f'发送失败: {str(e)}'})
 
-            if not smtp_username or not smtp_password:
-                return jsonify({'success': False, 'message': '请先配置SMTP用户名和密码'})
+        if not smtp_username or not smtp_password:
+            return ojson({'success': False, 'message': '请先配置SMTP用户名和密码'})
 
-            # 构建邮件
-            message = MIMEText(f'这是一封来自 {site_name} 的测试邮件，如果您收到此邮件，说明邮件配置正确。', 'plain', 'utf-8')
-            message['From'] = Header(f'{site_name} <{smtp_username}>', 'utf-8')
-            message['To'] = Header(test_to, 'utf-8')
-            message['Subject'] = Header(f'{site_name} - 邮件配置测试', 'utf-8')
+        # 未启用Redis时任务状态无法在worker间共享，轮询请求可能落到其他worker上，
+        # 直接在本请求中发送并返回结果（gevent worker 等待SMTP期间不阻塞其他请求）
+        if not admin_cache.enabled:
+            success, message = _send_test_email(
+                smtp_host, smtp_port, smtp_username, smtp_password, site_name, test_to
+            )
+            return ojson({'success': success, 'message': message})
 
-            # 发送邮件
-            if smtp_port == 465:
-                server = smtplib.SMTP_SSL(smtp_host, smtp_port)
-            else:
-                server = smtplib.SMTP(smtp_host, smtp_port)
-                server.starttls()
+        # 交给后台线程发送，立即返回任务id，前端轮询发送结果
+        task_id = uuid.uuid4().hex
+        save_email_task(task_id, {'done': False})
 
-            server.login(smtp_username, smtp_password)
-            server.sendmail(smtp_username, [test_to], message.as_string())
-            server.quit()
+        def on_done(future):
+            success, message = future.result()
+            save_email_task(task_id, {'done': True, 'success': success, 'message': message})
 
-            return jsonify({'success': True, 'message': f'测试邮件已发送到 {test_to}'})
-        except Exception as e:
-            logger.error(f"发送测试邮件失败: {e}")
-            return jsonify({'success': False, 'message': f'发送失败: {str(e)}'})
+        EMAIL_EXECUTOR.submit(
+            _send_test_email, smtp_host, smtp_port, smtp_username, smtp_password, site_name, test_to
+        ).add_done_callback(on_done)
+
+        return ojson({'success': True, 'task_id': task_id, 'message': f'正在发送测试邮件到 {test_to}'}, 202)
+
+    @admin_bp.route('/api/system/test-email/status/<task_id>')
+    @admin_required
+    def test_email_status(task_id):
+        """查询测试邮件发送结果"""
+        result = load_email_task(task_id)
+        if result is None:
+            return ojson({'success': False, 'message': '任务不存在或已过期'}, 404)
+        return ojson({'success': True, **result})
 
     @admin_bp.route('/api/system/logs')
     @admin_required
+    @etag_cached()
     def get_operation_logs():
         """获取操作日志"""
         page = request.args.get('page', 1, type=int)
@@ -765,34 +1025,35 @@ def create_admin_blueprint(admin_auth, admin_stats=None, user_manager=None):
             start_date=start_date,
             end_date=end_date
         )
-        return jsonify(result)
+        return ojson(result)
 
     @admin_bp.route('/api/config/batch', methods=['POST'])
     @admin_required
+    @json_body
     def batch_update_config():
         """批量更新配置"""
-        data = request.get_json() or {}
+        data = g.json_body
         settings = data.get('settings', [])
 
         if not settings:
-            return jsonify({'success': False, 'message': '没有要更新的配置'})
+            return ojson({'success': False, 'message': '没有要更新的配置'})
 
-        success_count = 0
-        error_count = 0
+        pairs = [
+            (setting.get('key'), setting.get('value'))
+            for setting in settings
+            if setting.get('key') and setting.get('value') is not None
+        ]
 
-        for setting in settings:
-            key = setting.get('key')
-            value = setting.get('value')
-            if key and value is not None:
-                if admin_stats.update_system_config(key, value):
-                    success_count += 1
-                else:
-                    error_count += 1
+        # 所有配置在一个事务中写入，要么全部成功要么全部失败
+        if admin_stats.update_system_configs(pairs):
+            success_count, error_count = len(pairs), 0
+        else:
+            success_count, error_count = 0, len(pairs)
 
         if error_count == 0:
-            return jsonify({'success': True, 'message': f'成功更新 {success_count} 项配置'})
+            return ojson({'success': True, 'message': f'成功更新 {success_count} 项配置'})
         else:
-            return jsonify({
+            return ojson({
                 'success': success_count > 0,
                 'message': f'成功 {success_count} 项，失败 {error_count} 项'
             })
@@ -5,31 +5,62 @@
 
 import pymysql
 import logging
+import time
 from datetime import datetime, timedelta
 from decimal import Decimal
+from admin_cache import CONFIG_INVALIDATE_CHANNEL
 
 logger = logging.getLogger(__name__)
 
+# 进程内系统配置缓存的有效期（秒），未收到Redis失效通知时最多读到这么久之前的配置
+SYSTEM_CONFIG_TTL = 60
+# 连接从库的超时时间（秒），从库不可用时尽快回退到主库
+REPLICA_CONNECT_TIMEOUT = 2
+# 从库连接失败后，这段时间（秒）内的只读查询直接走主库，不再等待从库超时
+REPLICA_RETRY_INTERVAL = 30
+
 class AdminStats:
-    def __init__(self, db_config):
+    def __init__(self, db_config, admin_cache=None, replica_config=None):
         self.db_config = db_config
+        # 只读从库，列表和统计查询优先走从库，未配置时全部走主库
+        self.replica_config = replica_config
+        # 从库连接失败后暂停使用从库的截止时间（time.monotonic）
+        self._replica_down_until = 0
+        # 用于跨worker广播配置变更，未启用Redis时只靠过期时间刷新
+        self.admin_cache = admin_cache
+        self._system_config = None
+        self._system_config_expires = 0
+    
+    def get_db_connection(self, readonly=False):
+        """
+        获取数据库连接
+        readonly=True 时连接从库，从库连接失败时回退到主库
+        """
+        if readonly and self.replica_config and time.monotonic() >= self._replica_down_until:
+            try:
+                return self._connect(self.replica_config, connect_timeout=REPLICA_CONNECT_TIMEOUT)
+            except pymysql.OperationalError as e:
+                self._replica_down_until = time.monotonic() + REPLICA_RETRY_INTERVAL
+                logger.warning(f"连接从库失败，{REPLICA_RETRY_INTERVAL}秒内改用主库: {e}")
+        return self._connect(self.db_config)
     
-    def get_db_connection(self):
-        """获取数据库连接"""
+    def _connect(self, db_config, **kwargs):
+        """按配置建立连接"""
         return pymysql.connect(
-            host=self.db_config['host'],
-            user=self.db_config['user'],
-            password=self.db_config['password'],
-            database=self.db_config['database'],
+            host=db_config['host'],
+            user=db_config['user'],
+            password=db_config['password'],
+            database=db_config['database'],
             charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
+            cursorclass=pymysql.cursors.DictCursor,
+            **kwargs
         )
     
     def get_dashboard_stats(self):
         """获取仪表盘统计数据"""
         conn = None
         try:
-            conn = self.get_db_connection()
+            conn = self.get_db_connection(readonly=True)
             with conn.cursor() as cursor:
                 stats = {}
                 
@@ -54,8 +85,9 @@ class AdminStats:
                 return stats
         except Exception as e:
             logger.error(f"获取统计数据失败: {e}")
-            # 返回默认数据结构
+            # 返回默认数据结构，failed 标记使这份数据不被缓存
             return {
+                'failed': True,
                 'users': {'total_users': 0, 'active_users': 0, 'today_new_users': 0, 'month_new_users': 0},
                 'finance': {'total_revenue': 0, 'today_revenue': 0, 'month_revenue': 0, 'total_balance': 0, 'total_consumption': 0},
                 'services': {'service_usage': [], 'today_usage': 0, 'total_papers': 0, 'total_defense_questions': 0},
@@ -67,6 +99,55 @@ class AdminStats:
             if conn:
                 conn.close()
     
+    def get_summary_stats(self):
+        """
+        获取统计概要（/admin/api/stats 轮询使用）
+        只需要6个数字，用一条SQL算出，不执行仪表盘的服务统计、最近交易等查询
+        """
+        conn = None
+        try:
+            conn = self.get_db_connection(readonly=True)
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT
+                        COUNT(*) as total_users,
+                        COALESCE(SUM(last_login_at >= DATE_SUB(NOW(), INTERVAL 7 DAY)), 0) as active_users,
+                        COALESCE(SUM(DATE(created_at) = CURDATE()), 0) as today_users,
+                        COALESCE(SUM(last_login_at > DATE_SUB(NOW(), INTERVAL 30 MINUTE)), 0) as online_users,
+                        (SELECT COALESCE(SUM(amount), 0)
+                         FROM recharge_records
+                         WHERE status IN ('success', 'paid', '1', 1)) as total_revenue,
+                        (SELECT COALESCE(SUM(amount), 0)
+                         FROM recharge_records
+                         WHERE status IN ('success', 'paid', '1', 1)
+                         AND DATE(COALESCE(paid_at, created_at)) = CURDATE()) as today_revenue
+                    FROM users
+                    WHERE role = 'user'
+                """)
+                row = cursor.fetchone()
+                return {
+                    'total_users': row['total_users'],
+                    'total_revenue': float(row['total_revenue']),
+                    'today_users': int(row['today_users']),
+                    'today_revenue': float(row['today_revenue']),
+                    'active_users': int(row['active_users']),
+                    'online_users': int(row['online_users'])
+                }
+        except Exception as e:
+            logger.error(f"获取统计概要失败: {e}")
+            return {
+                'failed': True,
+                'total_users': 0,
+                'total_revenue': 0,
+                'today_users': 0,
+                'today_revenue': 0,
+                'active_users': 0,
+                'online_users': 0
+            }
+        finally:
+            if conn:
+                conn.close()
+    
     def _get_user_stats(self, cursor):
         """获取用户统计"""
         stats = {}
@@ -263,19 +344,25 @@ class AdminStats:
         """)
         return cursor.fetchall()
     
-    def get_user_list(self, page=1, per_page=20, search=None, status=None):
-        """获取用户列表"""
+    def get_user_list(self, page=1, per_page=20, search=None, status=None, after_id=None, total=None):
+        """
+        获取用户列表
+        after_id 为上一页最后一个用户的id，传入时按id向后取（keyset分页），不再使用OFFSET；
+        total 为服务端缓存的该筛选条件下的总数，传入时跳过 COUNT 查询
+        """
         conn = None
         try:
-            conn = self.get_db_connection()
+            conn = self.get_db_connection(readonly=True)
             with conn.cursor() as cursor:
                 # 构建查询条件
                 where_conditions = ["role = 'user'"]
                 params = []
                 
                 if search:
+                    # 前缀匹配可以走 username/email 索引，%xxx% 会全表扫描
+                    pattern = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
                     where_conditions.append("(username LIKE %s OR email LIKE %s)")
-                    params.extend([f"%{search}%", f"%{search}%"])
+                    params.extend([pattern, pattern])
                 
                 if status is not None:
                     where_conditions.append("status = %s")
@@ -283,39 +370,57 @@ class AdminStats:
                 
                 where_clause = " WHERE " + " AND ".join(where_conditions)
                 
-                # 获取总数
-                cursor.execute(f"SELECT COUNT(*) as total FROM users{where_clause}", params)
-                total = cursor.fetchone()['total']
+                # 获取总数（仅在首次查询时）
+                if total is None:
+                    cursor.execute(f"SELECT COUNT(*) as total FROM users{where_clause}", params)
+                    total = cursor.fetchone()['total']
                 
-                # 获取分页数据
-                offset = (page - 1) * per_page
-                cursor.execute(f"""
-                    SELECT 
+                # 获取分页数据，多取一行用于判断是否还有下一页
+                columns = """
                         id, username, email, balance, total_recharge, 
                         total_consumption, invite_earnings, status, 
                         created_at, last_login_at, last_login_ip
-                    FROM users{where_clause}
-                    ORDER BY created_at DESC
-                    LIMIT %s OFFSET %s
-                """, params + [per_page, offset])
+                """
+                if after_id:
+                    cursor.execute(f"""
+                        SELECT {columns}
+                        FROM users{where_clause} AND id < %s
+                        ORDER BY id DESC
+                        LIMIT %s
+                    """, params + [after_id, per_page + 1])
+                else:
+                    offset = (page - 1) * per_page
+                    cursor.execute(f"""
+                        SELECT {columns}
+                        FROM users{where_clause}
+                        ORDER BY id DESC
+                        LIMIT %s OFFSET %s
+                    """, params + [per_page + 1, offset])
                 
                 users = cursor.fetchall()
+                has_next = len(users) > per_page
+                users = users[:per_page]
                 
                 return {
                     'users': users,
                     'total': total,
                     'page': page,
                     'per_page': per_page,
-                    'total_pages': (total + per_page - 1) // per_page
+                    'total_pages': (total + per_page - 1) // per_page,
+                    'has_next': has_next,
+                    'next_cursor': users[-1]['id'] if has_next else None
                 }
         except Exception as e:
             logger.error(f"获取用户列表失败: {e}")
             return {
+                'failed': True,
                 'users': [],
                 'total': 0,
                 'page': page,
                 'per_page': per_page,
-                'total_pages': 0
+                'total_pages': 0,
+                'has_next': False,
+                'next_cursor': None
             }
         finally:
             if conn:
@@ -385,7 +490,35 @@ class AdminStats:
                 conn.close()
     
     def get_system_config(self):
-        """获取系统配置"""
+        """
+        获取系统配置
+        配置读多写少，在进程内缓存 SYSTEM_CONFIG_TTL 秒；写入时通过Redis通知所有worker清空缓存
+        """
+        if self.admin_cache is not None:
+            self.admin_cache.subscribe(CONFIG_INVALIDATE_CHANNEL, self._clear_system_config)
+        
+        cached = self._system_config
+        if cached is not None and time.monotonic() < self._system_config_expires:
+            return dict(cached)
+        
+        configs = self._load_system_config()
+        if configs:
+            self._system_config = configs
+            self._system_config_expires = time.monotonic() + SYSTEM_CONFIG_TTL
+        return dict(configs)
+    
+    def _clear_system_config(self):
+        """清空本进程的系统配置缓存"""
+        self._system_config = None
+    
+    def invalidate_system_config(self):
+        """系统配置变更后清空本进程缓存，并通知其他worker"""
+        self._clear_system_config()
+        if self.admin_cache is not None:
+            self.admin_cache.publish(CONFIG_INVALIDATE_CHANNEL)
+    
+    def _load_system_config(self):
+        """从数据库读取系统配置"""
         conn = None
         try:
             conn = self.get_db_connection()
@@ -431,7 +564,8 @@ class AdminStats:
                         config_value = VALUES(config_value)
                     """, (config_key, config_value))
                 conn.commit()
-                return True
+            self.invalidate_system_config()
+            return True
         except Exception as e:
             logger.error(f"更新系统配置失败: {e}")
             if conn:
@@ -441,11 +575,40 @@ class AdminStats:
             if conn:
                 conn.close()
     
+    def update_system_configs(self, pairs):
+        """
+        批量更新系统配置，pairs 为 [(config_key, config_value), ...]
+        executemany 会把整批合并为一条多行 INSERT ... ON DUPLICATE KEY UPDATE，在同一事务中提交
+        """
+        if not pairs:
+            return True
+        conn = None
+        try:
+            conn = self.get_db_connection()
+            with conn.cursor() as cursor:
+                cursor.executemany("""
+                    INSERT INTO system_config (config_key, config_value)
+                    VALUES (%s, %s)
+                    ON DUPLICATE KEY UPDATE 
+                    config_value = VALUES(config_value)
+                """, pairs)
+                conn.commit()
+            self.invalidate_system_config()
+            return True
+        except Exception as e:
+            logger.error(f"批量更新系统配置失败: {e}")
+            if conn:
+                conn.rollback()
+            return False
+        finally:
+            if conn:
+                conn.close()
+    
     def get_detailed_statistics(self, time_range='7days', start_date=None, end_date=None):
         """获取详细的统计数据用于数据统计页面"""
         conn = None
         try:
-            conn = self.get_db_connection()
+            conn = self.get_db_connection(readonly=True)
             with conn.cursor() as cursor:
                 # 根据时间范围设置日期条件
                 date_condition = self._get_date_condition(time_range, start_date, end_date)
@@ -494,6 +657,49 @@ class AdminStats:
             if conn:
                 conn.close()
     
+    def _get_date_range(self, time_range, start_date, end_date):
+        """根据时间范围返回 (开始日期, 结束日期)，含两端；自定义日期格式不正确时按最近7天"""
+        today = datetime.now().date()
+        days = {'7days': 7, '30days': 30, '90days': 90}.get(time_range)
+        if time_range == 'custom' and start_date and end_date:
+            try:
+                return (datetime.strptime(start_date, '%Y-%m-%d').date(),
+                        datetime.strptime(end_date, '%Y-%m-%d').date())
+            except ValueError:
+                pass
+        return today - timedelta(days=(days or 7) - 1), today
+    
+    def iter_report_rows(self, time_range='7days', start_date=None, end_date=None):
+        """
+        逐行返回时间范围内的充值明细（生成器），用于导出报表
+        使用服务端游标边读边返回，长时间范围的报表也不会把全部记录加载到内存
+        """
+        start, end = self._get_date_range(time_range, start_date, end_date)
+        conn = None
+        try:
+            conn = self.get_db_connection(readonly=True)
+            with conn.cursor(pymysql.cursors.SSDictCursor) as cursor:
+                cursor.execute("""
+                    SELECT
+                        r.id, r.user_id, u.username, u.email, r.amount, r.payment_method,
+                        r.description, COALESCE(r.paid_at, r.created_at) as paid_at
+                    FROM recharge_records r
+                    LEFT JOIN users u ON u.id = r.user_id
+                    WHERE r.status IN ('success', 'paid', '1', 1)
+                    AND r.created_at >= %s AND r.created_at < %s
+                    ORDER BY r.id
+                """, (start, end + timedelta(days=1)))
+                
+                for row in cursor:
+                    yield row
+        except Exception as e:
+            # 继续抛出，让流式响应中断，而不是当作正常结束发出一个不完整的文件
+            logger.error(f"导出报表失败: {e}")
+            raise
+        finally:
+            if conn:
+                conn.close()
+    
     def _get_date_condition(self, time_range, start_date, end_date):
         """根据时间范围生成SQL日期条件"""
         if time_range == '7days':
@@ -873,11 +1079,11 @@ class AdminStats:
         
         return results
     
-    def get_announcement_list(self, page=1, per_page=20, search=None, type_filter=None, status_filter=None):
-        """获取公告列表（管理端）"""
+    def get_announcement_list(self, page=1, per_page=20, search=None, type_filter=None, status_filter=None, total=None):
+        """获取公告列表（管理端），total 为服务端缓存的该筛选条件下的总数，传入时跳过 COUNT 查询"""
         conn = None
         try:
-            conn = self.get_db_connection()
+            conn = self.get_db_connection(readonly=True)
             with conn.cursor() as cursor:
                 # 构建查询条件
                 where_conditions = []
@@ -897,11 +1103,12 @@ class AdminStats:
                 
                 where_clause = " WHERE " + " AND ".join(where_conditions) if where_conditions else ""
                 
-                # 获取总数
-                cursor.execute(f"SELECT COUNT(*) as total FROM announcements{where_clause}", params)
-                total = cursor.fetchone()['total']
+                # 获取总数（仅在首次查询时）
+                if total is None:
+                    cursor.execute(f"SELECT COUNT(*) as total FROM announcements{where_clause}", params)
+                    total = cursor.fetchone()['total']
                 
-                # 获取分页数据
+                # 获取分页数据，多取一行用于判断是否还有下一页
                 offset = (page - 1) * per_page
                 cursor.execute(f"""
                     SELECT 
@@ -910,25 +1117,29 @@ class AdminStats:
                     FROM announcements{where_clause}
                     ORDER BY is_sticky DESC, created_at DESC
                     LIMIT %s OFFSET %s
-                """, params + [per_page, offset])
+                """, params + [per_page + 1, offset])
                 
                 announcements = cursor.fetchall()
+                has_next = len(announcements) > per_page
                 
                 return {
-                    'announcements': announcements,
+                    'announcements': announcements[:per_page],
                     'total': total,
                     'page': page,
                     'per_page': per_page,
-                    'total_pages': (total + per_page - 1) // per_page
+                    'total_pages': (total + per_page - 1) // per_page,
+                    'has_next': has_next
                 }
         except Exception as e:
             logger.error(f"获取公告列表失败: {e}")
             return {
+                'failed': True,
                 'announcements': [],
                 'total': 0,
                 'page': page,
                 'per_page': per_page,
-                'total_pages': 0
+                'total_pages': 0,
+                'has_next': False
             }
         finally:
             if conn:
@@ -1288,7 +1499,7 @@ class AdminStats:
 
             conn = self.get_db_connection()
             with conn.cursor() as cursor:
-                imported_count = 0
+                rows = []
                 skipped_count = 0
 
                 for key, item in config_data['configs'].items():
@@ -1300,23 +1511,28 @@ class AdminStats:
                         skipped_count += 1
                         continue
 
-                    cursor.execute("""
+                    rows.append((key, value, description))
+
+                # 合并为一条多行 INSERT
+                if rows:
+                    cursor.executemany("""
                         INSERT INTO system_config (config_key, config_value, description)
                         VALUES (%s, %s, %s)
                         ON DUPLICATE KEY UPDATE
                         config_value = VALUES(config_value),
                         description = COALESCE(VALUES(description), description)
-                    """, (key, value, description))
-                    imported_count += 1
+                    """, rows)
+                imported_count = len(rows)
 
                 conn.commit()
 
-                return {
-                    'success': True,
-                    'message': f'成功导入 {imported_count} 项配置，跳过 {skipped_count} 项敏感配置',
-                    'imported': imported_count,
-                    'skipped': skipped_count
-                }
+            self.invalidate_system_config()
+            return {
+                'success': True,
+                'message': f'成功导入 {imported_count} 项配置，跳过 {skipped_count} 项敏感配置',
+                'imported': imported_count,
+                'skipped': skipped_count
+            }
         except Exception as e:
             logger.error(f"导入配置失败: {e}")
             if conn:
@@ -1361,17 +1577,17 @@ class AdminStats:
                     ('ai_api_base', 'https://api.deepseek.com', 'AI API地址'),
                 ]
 
-                for key, value, desc in default_configs:
-                    cursor.execute("""
-                        INSERT INTO system_config (config_key, config_value, description)
-                        VALUES (%s, %s, %s)
-                        ON DUPLICATE KEY UPDATE
-                        config_value = VALUES(config_value),
-                        description = VALUES(description)
-                    """, (key, value, desc))
+                cursor.executemany("""
+                    INSERT INTO system_config (config_key, config_value, description)
+                    VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                    config_value = VALUES(config_value),
+                    description = VALUES(description)
+                """, default_configs)
 
                 conn.commit()
-                return {'success': True, 'message': f'成功重置 {len(default_configs)} 项配置'}
+            self.invalidate_system_config()
+            return {'success': True, 'message': f'成功重置 {len(default_configs)} 项配置'}
         except Exception as e:
             logger.error(f"重置配置失败: {e}")
             if conn:
@@ -1385,7 +1601,7 @@ class AdminStats:
         """获取操作日志"""
         conn = None
         try:
-            conn = self.get_db_connection()
+            conn = self.get_db_connection(readonly=True)
             with conn.cursor() as cursor:
                 where_conditions = []
                 params = []
@@ -16,7 +16,9 @@ import secrets
 import re
 from datetime import datetime
 import requests
+from requests.adapters import HTTPAdapter
 import threading
+import atexit
 
 # 添加父目录到系统路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -34,10 +36,60 @@ from docx.enum.style import WD_STYLE_TYPE
 from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
 from user_manager import UserManager, login_required
+from json_response import ORJSON_AVAILABLE, OrjsonProvider
 
 # 导入配置模块
 from app_config import config
 
+# 响应压缩（可选）
+try:
+    from flask_compress import Compress
+    COMPRESS_AVAILABLE = True
+except ImportError:
+    COMPRESS_AVAILABLE = False
+
+# Redis会话存储（可选）
+try:
+    import redis
+    from flask_session import Session
+    REDIS_SESSION_AVAILABLE = True
+except ImportError:
+    REDIS_SESSION_AVAILABLE = False
+
+# 日志异步输出：请求线程只把日志记录放入队列，由后台线程写入原有的处理器
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# 已启动日志队列的进程号；gunicorn 预加载时master不处理请求，队列和后台线程只在各worker中创建
+_log_queue_pid = None
+_log_queue_lock = threading.Lock()
+
+
+def start_log_queue():
+    """
+    在当前进程中把根日志处理器换成队列，每个进程只执行一次
+    根日志没有处理器时（如直接 python app.py 运行）不做处理，Flask 仍使用默认处理器输出日志
+    """
+    global _log_queue_pid
+    pid = os.getpid()
+    if _log_queue_pid == pid:
+        return
+    with _log_queue_lock:
+        if _log_queue_pid == pid:
+            return
+        _log_queue_pid = pid
+        root_logger = logging.getLogger()
+        handlers = [h for h in root_logger.handlers if not isinstance(h, QueueHandler)]
+        if not handlers:
+            return
+        log_queue = queue.Queue(-1)
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        root_logger.handlers = [QueueHandler(log_queue)]
+        listener.start()
+        # 进程退出时写完队列中剩余的日志
+        atexit.register(listener.stop)
+
 # 导入虎皮椒支付类
 try:
     # 添加虎皮椒支付模块路径
@@ -69,9 +121,33 @@ except Exception as e:
             raise Exception("虎皮椒支付模块未正确导入")
 
 app = Flask(__name__)
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
+app.before_request(start_log_queue)
 CORS(app)
+
+# JSON接口和页面超过500字节时按客户端支持使用br或gzip压缩
+if COMPRESS_AVAILABLE:
+    app.config.update(
+        COMPRESS_MIMETYPES=['application/json', 'text/html'],
+        COMPRESS_ALGORITHM=['br', 'gzip'],
+        COMPRESS_LEVEL=5,
+        COMPRESS_MIN_SIZE=500
+    )
+    Compress(app)
 app.secret_key = config.SECRET_KEY  # 从环境变量加载
 
+# 配置了Redis时会话数据保存在Redis中，Cookie里只有会话id，每次请求不再反序列化和校验整个会话Cookie
+if config.REDIS_URL and REDIS_SESSION_AVAILABLE:
+    app.config.update(
+        SESSION_TYPE='redis',
+        SESSION_REDIS=redis.Redis.from_url(config.REDIS_URL),
+        SESSION_KEY_PREFIX='session:',
+        # 与Flask默认会话一致：登录时设置 session.permanent = True 才使用长期有效期
+        SESSION_PERMANENT=False
+    )
+    Session(app)
+
 # 数据库配置 - 从环境变量加载
 DB_CONFIG = config.get_db_config()
 
@@ -95,22 +171,31 @@ app.user_manager = user_manager
 from admin_auth import AdminAuth
 from admin_routes import create_admin_blueprint
 from admin_stats import AdminStats
+from admin_cache import AdminCache
 
 # 初始化管理员认证和统计
-admin_auth = AdminAuth(DB_CONFIG)
+admin_auth = AdminAuth(DB_CONFIG, bcrypt_rounds=config.BCRYPT_ROUNDS)
 admin_auth.init_admin_table()  # 初始化管理员表
 
+# 管理后台缓存（未配置 REDIS_URL 时不启用）
+admin_cache = AdminCache(config.REDIS_URL)
+
 # 初始化管理员统计模块
-admin_stats = AdminStats(DB_CONFIG)
+admin_stats = AdminStats(DB_CONFIG, admin_cache, config.get_replica_db_config())
 
 # 注册管理员蓝图
-admin_blueprint = create_admin_blueprint(admin_auth, admin_stats, user_manager)
+admin_blueprint = create_admin_blueprint(admin_auth, admin_stats, user_manager, admin_cache)
 app.register_blueprint(admin_blueprint)
 
 # DeepSeek API配置 - 从环境变量加载
 DEEPSEEK_API_KEY = config.DEEPSEEK_API_KEY
 DEEPSEEK_API_URL = config.DEEPSEEK_API_URL
 
+# DeepSeek请求共用连接池，保持与API的长连接，避免每次调用重新进行TCP/TLS握手
+# 连接在首次请求时才建立，preload到master中也不会产生跨进程共享的socket
+deepseek_session = requests.Session()
+deepseek_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=50))
+
 # 内存中存储项目（实际应用中应使用数据库）
 projects = {}
 
@@ -255,7 +340,7 @@ def translate_database_terms_with_ai(entities_data, relationships_data=None):
             "max_tokens": 2000
         }
 
-        response = requests.post(DEEPSEEK_API_URL, headers=headers, json=data, timeout=90)
+        response = deepseek_session.post(DEEPSEEK_API_URL, headers=headers, json=data, timeout=90)
 
         if response.status_code == 200:
             result = response.json()
@@ -1761,21 +1846,10 @@ def api_parse_sql():
             entity_data = {
                 'name': entity_name,
                 'displayName': entity.get_display_name(), # 添加实体显示名称
-                'attributes': []
+                # 字段含外键标识、显示名称（可能已被翻译覆盖）、可空及默认值
+                'attributes': [attr.to_dict() for attr in entity.attributes]
             }
 
-            for attr in entity.attributes:
-                entity_data['attributes'].append({
-                    'name': attr.name,
-                    'type': attr.data_type,
-                    'isPK': attr.is_pk,
-                    'isFK': attr.is_fk,                 # 新增: 外键标识
-                    'comment': attr.comment,
-                    'displayName': attr.display_name,  # 修复: 使用属性而非方法
-                    'nullable': attr.nullable,          # 新增: 可空属性
-                    'default': attr.default             # 新增: 默认值属性
-                })
-
             result['entities'].append(entity_data)
 
         # 处理关系
@@ -1850,7 +1924,7 @@ def api_translate_terms():
             "max_tokens": 1000
         }
 
-        response = requests.post(DEEPSEEK_API_URL, headers=headers, json=api_data, timeout=90)
+        response = deepseek_session.post(DEEPSEEK_API_URL, headers=headers, json=api_data, timeout=90)
 
         if response.status_code == 200:
             result = response.json()
@@ -2162,7 +2236,7 @@ def api_test_deepseek():
             'max_tokens': 50
         }
 
-        response = requests.post(DEEPSEEK_API_URL, headers=headers, json=test_payload, timeout=30)
+        response = deepseek_session.post(DEEPSEEK_API_URL, headers=headers, json=test_payload, timeout=30)
 
         if response.status_code == 200:
             result = response.json()
@@ -2513,7 +2587,7 @@ def generate_system_structure_with_ai(description):
             "max_tokens": 3000
         }
 
-        response = requests.post(DEEPSEEK_API_URL, headers=headers, json=data, timeout=120)
+        response = deepseek_session.post(DEEPSEEK_API_URL, headers=headers, json=data, timeout=120)
 
         if response.status_code == 200:
             result = response.json()
@@ -2743,7 +2817,7 @@ SQL语句：
         for attempt in range(max_retries):
             try:
                 app.logger.info(f"开始调用DeepSeek API生成简化ER图... (尝试 {attempt + 1}/{max_retries})")
-                response = requests.post(DEEPSEEK_API_URL, headers=headers, json=data, timeout=120)
+                response = deepseek_session.post(DEEPSEEK_API_URL, headers=headers, json=data, timeout=120)
 
                 if response.status_code == 200:
                     result = response.json()
@@ -3080,7 +3154,7 @@ def generate_test_cases_with_ai(system_name, test_type, system_description):
             "max_tokens": 4000
         }
 
-        response = requests.post(DEEPSEEK_API_URL, headers=headers, json=data, timeout=120)
+        response = deepseek_session.post(DEEPSEEK_API_URL, headers=headers, json=data, timeout=120)
 
         if response.status_code == 200:
             result = response.json()
@@ -4149,7 +4223,7 @@ def generate_intelligent_outline(description, total_words, field, paper_type):
         }
 
         try:
-            response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=120)
+            response = deepseek_session.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=120)
 
             if response.status_code == 200:
                 result = response.json()
@@ -4265,7 +4339,7 @@ def generate_intelligent_outline_enhanced(title, field, paper_type, total_words,
 
         try:
             app.logger.info("开始调用AI生成智能目录...")
-            response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=120)
+            response = deepseek_session.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=120)
 
             if response.status_code == 200:
                 result = response.json()
@@ -5927,7 +6001,7 @@ def call_deepseek_api_with_search(prompt, max_tokens=3000):
         app.logger.info(f"发起DeepSeek联网搜索请求，提示词长度: {len(prompt)}")
         
         # 联网搜索通常需要更长时间
-        response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=180)
+        response = deepseek_session.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=180)
         
         if response.status_code == 200:
             result = response.json()
@@ -5941,7 +6015,7 @@ def call_deepseek_api_with_search(prompt, max_tokens=3000):
             app.logger.warning("API频率限制，等待后重试")
             time.sleep(5)
             # 重试一次
-            response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=180)
+            response = deepseek_session.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=180)
             if response.status_code == 200:
                 result = response.json()
                 return result['choices'][0]['message']['content']
@@ -6007,7 +6081,7 @@ def call_deepseek_api(prompt, max_tokens=3000):
             try:
                 app.logger.info(f"API调用尝试 {attempt + 1}/3，max_tokens: {max_tokens}")
                 
-                response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=120)
+                response = deepseek_session.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=120)
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -6543,7 +6617,7 @@ AI文本句式均匀，人类写作有节奏变化：
 
         app.logger.info(f"开始优化文本片段，长度: {len(text_segment)}, 模式: {mode}, 强度: {intensity}, temperature: {temperature}")
 
-        response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=120)
+        response = deepseek_session.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=120)
 
         if response.status_code == 200:
             result = response.json()
@@ -7793,7 +7867,7 @@ def generate_fragment_questions_with_ai(thesis_title, research_field, fragment,
                 # 记录请求信息以便调试
                 app.logger.info(f"DeepSeek API 片段分析请求第{attempt+1}次，prompt长度: {len(prompt)}")
                 
-                response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=90)
+                response = deepseek_session.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=90)
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -8010,7 +8084,7 @@ def generate_defense_questions_with_ai(thesis_title, research_field, thesis_abst
                 # 记录请求信息以便调试
                 app.logger.info(f"DeepSeek API 请求第{attempt+1}次，prompt长度: {len(prompt)}")
                 
-                response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=150)  # 增加超时时间到150秒
+                response = deepseek_session.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=150)  # 增加超时时间到150秒
                 
                 if response.status_code == 200:
                     result = response.json()
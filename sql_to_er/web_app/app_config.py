@@ -22,6 +22,17 @@ class Config:
     DB_NAME = os.getenv('DB_NAME', 'user_system')
     DB_CHARSET = os.getenv('DB_CHARSET', 'utf8mb4')
 
+    # 只读从库配置，留空则所有查询都走主库；用户名密码未设置时与主库相同
+    DB_REPLICA_HOST = os.getenv('DB_REPLICA_HOST', '')
+    DB_REPLICA_USER = os.getenv('DB_REPLICA_USER', '')
+    DB_REPLICA_PASSWORD = os.getenv('DB_REPLICA_PASSWORD', '')
+
+    # Redis 配置，留空则不启用管理后台缓存和Redis会话存储
+    REDIS_URL = os.getenv('REDIS_URL', '')
+
+    # 新生成密码哈希时的 bcrypt 成本因子
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '10'))
+
     @classmethod
     def get_db_config(cls):
         """获取数据库配置字典"""
@@ -33,6 +44,19 @@ class Config:
             'charset': cls.DB_CHARSET
         }
 
+    @classmethod
+    def get_replica_db_config(cls):
+        """获取只读从库配置字典，未配置从库时返回 None"""
+        if not cls.DB_REPLICA_HOST:
+            return None
+        return {
+            'host': cls.DB_REPLICA_HOST,
+            'user': cls.DB_REPLICA_USER or cls.DB_USER,
+            'password': cls.DB_REPLICA_PASSWORD or cls.DB_PASSWORD,
+            'database': cls.DB_NAME,
+            'charset': cls.DB_CHARSET
+        }
+
     # 邮件配置
     SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.qq.com')
     SMTP_PORT = int(os.getenv('SMTP_PORT', '465'))
@@ -0,0 +1,99 @@
+"""
+JSON响应模块
+高频接口使用 orjson 直接序列化为 bytes，省去 jsonify 的标准库 json 编码开销，请求体也用 orjson 解析
+未安装 orjson 时回退到 jsonify / 标准库 json，输出格式保持一致
+只读接口可加 etag_cached，内容未变化时返回 304；写接口用 json_body 统一解析请求体
+"""
+
+import datetime
+import decimal
+import hashlib
+import json
+import uuid
+from functools import wraps
+
+from flask import Response, g, jsonify, make_response, request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    # datetime 交给 default 处理，与 jsonify 一样输出 HTTP 日期格式，前端解析方式不变
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def json_loads(data):
+    """解析JSON文本或bytes；orjson.JSONDecodeError 是 json.JSONDecodeError 的子类，调用方按后者捕获即可"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """request.get_json() 使用 orjson 解析请求体，序列化仍沿用 Flask 默认实现"""
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+def _default(o):
+    """orjson 无法直接序列化的类型，转换规则与 Flask 默认 JSON 提供者相同"""
+    if isinstance(o, datetime.date):
+        return http_date(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def ojson(payload, status=200):
+    """返回JSON响应，用法同 jsonify(payload), status"""
+    if not ORJSON_AVAILABLE:
+        return jsonify(payload), status
+    return Response(
+        orjson.dumps(payload, default=_default, option=_ORJSON_OPTIONS),
+        status=status,
+        mimetype='application/json'
+    )
+
+
+def json_body(f):
+    """
+    请求体JSON只解析一次，结果放在 g.json_body 中供视图使用
+    请求体为空、不是JSON或格式错误时为 {}，视图中不必再处理 None
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.json_body = request.get_json(cache=False, silent=True) or {}
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def etag_cached(max_age=0):
+    """
+    只读GET接口的条件请求装饰器：按响应内容生成ETag，客户端带 If-None-Match 且内容未变化时返回304，不再传输响应体
+    max_age 为浏览器可直接使用本地缓存的秒数，0 表示每次都需要重新验证
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            response = make_response(f(*args, **kwargs))
+            if request.method != 'GET' or response.status_code != 200 or response.is_streamed:
+                return response
+            etag = hashlib.blake2b(response.get_data(), digest_size=8).hexdigest()
+            response.set_etag(etag)
+            # 管理后台数据只允许浏览器缓存，不允许代理等共享缓存
+            response.cache_control.private = True
+            if max_age:
+                response.cache_control.max_age = max_age
+            else:
+                response.cache_control.no_cache = True
+            return response.make_conditional(request)
+        return decorated_function
+    return decorator
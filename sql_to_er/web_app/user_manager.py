@@ -113,97 +113,142 @@ class UserManager:
 
             conn = self.get_db_connection()
             with conn.cursor() as cursor:
-                # 防刷检查：同一IP 24小时内最多注册3个账户
-                if ip_address:
-                    cursor.execute("""
-                        SELECT COUNT(*) as count FROM users
-                        WHERE register_ip = %s AND created_at > DATE_SUB(NOW(), INTERVAL 24 HOUR)
-                    """, (ip_address,))
-                    ip_count = cursor.fetchone()['count']
-                    max_register_per_ip = int(self.get_system_config('max_register_per_ip', 3))
-                    if ip_count >= max_register_per_ip:
-                        logger.warning(f"IP {ip_address} 注册频率过高，已拒绝")
-                        return {'success': False, 'message': '注册过于频繁，请稍后再试'}
-
-                # 检查用户名是否已存在（如果提供了用户名）
-                if username:
-                    cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
-                    if cursor.fetchone():
-                        return {'success': False, 'message': '用户名已存在'}
+                result = self._insert_user(cursor, username, email, password, invite_code, ip_address)
+                if result['success']:
+                    conn.commit()
+                return result
 
-                # 检查邮箱是否已存在（如果提供了邮箱）
-                if email:
-                    cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
-                    if cursor.fetchone():
-                        return {'success': False, 'message': '邮箱已被注册'}
-
-                # 验证邀请码（如果提供）
-                inviter_id = None
-                inviter_email_domain = None
-                if invite_code:
-                    cursor.execute("SELECT id, email FROM users WHERE invite_code = %s", (invite_code,))
-                    inviter = cursor.fetchone()
-                    if not inviter:
-                        return {'success': False, 'message': '邀请码无效'}
-                    inviter_id = inviter['id']
-                    # 获取邀请人邮箱域名用于防自邀请检查
-                    if inviter['email']:
-                        inviter_email_domain = inviter['email'].split('@')[-1] if '@' in inviter['email'] else None
-
-                    # 防自邀请：检查邮箱域名是否相同（防止同一人注册多个账号刷奖励）
-                    if email and inviter_email_domain:
-                        new_email_domain = email.split('@')[-1] if '@' in email else None
-                        # 如果是临时邮箱或相同域名，需要额外验证
-                        temp_email_domains = ['tempmail.com', 'guerrillamail.com', '10minutemail.com', 'mailinator.com']
-                        if new_email_domain and (new_email_domain in temp_email_domains):
-                            logger.warning(f"检测到临时邮箱注册: {email}")
-                            return {'success': False, 'message': '不支持使用临时邮箱注册'}
-
-                # 生成新用户的邀请码
-                user_invite_code = self.generate_invite_code()
-
-                # 创建用户
-                password_hash = self.hash_password(password)
-                new_user_bonus = self.get_system_config('new_user_bonus', 10.00)
+        except Exception as e:
+            logger.error(f"用户注册失败: {e}")
+            return {'success': False, 'message': '注册失败，请稍后重试'}
+        finally:
+            if conn:
+                conn.close()
 
-                cursor.execute("""
-                    INSERT INTO users (username, email, password_hash, balance, invite_code, invited_by, register_ip)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (username, email, password_hash, new_user_bonus, user_invite_code, invite_code, ip_address))
+    def _insert_user(self, cursor, username, email, password, invite_code=None, ip_address=None):
+        """
+        在调用方的事务中校验并插入新用户（含邀请奖励），不提交
+        返回与 register_user 相同的结果字典
+        """
+        # 防刷检查：同一IP 24小时内最多注册3个账户
+        if ip_address:
+            cursor.execute("""
+                SELECT COUNT(*) as count FROM users
+                WHERE register_ip = %s AND created_at > DATE_SUB(NOW(), INTERVAL 24 HOUR)
+            """, (ip_address,))
+            ip_count = cursor.fetchone()['count']
+            max_register_per_ip = int(self.get_system_config('max_register_per_ip', 3))
+            if ip_count >= max_register_per_ip:
+                logger.warning(f"IP {ip_address} 注册频率过高，已拒绝")
+                return {'success': False, 'message': '注册过于频繁，请稍后再试'}
+
+        # 检查用户名是否已存在（如果提供了用户名）
+        if username:
+            cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
+            if cursor.fetchone():
+                return {'success': False, 'message': '用户名已存在'}
+
+        # 检查邮箱是否已存在（如果提供了邮箱）
+        if email:
+            cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
+            if cursor.fetchone():
+                return {'success': False, 'message': '邮箱已被注册'}
+
+        # 验证邀请码（如果提供）
+        inviter_id = None
+        inviter_email_domain = None
+        if invite_code:
+            cursor.execute("SELECT id, email FROM users WHERE invite_code = %s", (invite_code,))
+            inviter = cursor.fetchone()
+            if not inviter:
+                return {'success': False, 'message': '邀请码无效'}
+            inviter_id = inviter['id']
+            # 获取邀请人邮箱域名用于防自邀请检查
+            if inviter['email']:
+                inviter_email_domain = inviter['email'].split('@')[-1] if '@' in inviter['email'] else None
+
+            # 防自邀请：检查邮箱域名是否相同（防止同一人注册多个账号刷奖励）
+            if email and inviter_email_domain:
+                new_email_domain = email.split('@')[-1] if '@' in email else None
+                # 如果是临时邮箱或相同域名，需要额外验证
+                temp_email_domains = ['tempmail.com', 'guerrillamail.com', '10minutemail.com', 'mailinator.com']
+                if new_email_domain and (new_email_domain in temp_email_domains):
+                    logger.warning(f"检测到临时邮箱注册: {email}")
+                    return {'success': False, 'message': '不支持使用临时邮箱注册'}
+
+        # 生成新用户的邀请码
+        user_invite_code = self.generate_invite_code()
+
+        # 创建用户
+        password_hash = self.hash_password(password)
+        new_user_bonus = self.get_system_config('new_user_bonus', 10.00)
+
+        cursor.execute("""
+            INSERT INTO users (username, email, password_hash, balance, invite_code, invited_by, register_ip)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, (username, email, password_hash, new_user_bonus, user_invite_code, invite_code, ip_address))
+
+        user_id = cursor.lastrowid
+
+        # 如果有邀请人，给邀请人奖励
+        if inviter_id:
+            invite_reward = self.get_system_config('invite_reward', 5.00)
+
+            # 更新邀请人余额
+            cursor.execute("""
+                UPDATE users SET
+                    balance = balance + %s,
+                    invite_earnings = invite_earnings + %s
+                WHERE id = %s
+            """, (invite_reward, invite_reward, inviter_id))
 
-                user_id = cursor.lastrowid
+            # 记录邀请记录 - 添加奖励类型
+            cursor.execute("""
+                INSERT INTO invite_records (inviter_id, invitee_id, invite_code, reward_amount, reward_type)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (inviter_id, user_id, invite_code, invite_reward, 'registration'))
+
+        return {
+            'success': True,
+            'message': '注册成功',
+            'user_id': user_id,
+            'invite_code': user_invite_code,
+            'bonus': new_user_bonus
+        }
 
-                # 如果有邀请人，给邀请人奖励
-                if inviter_id:
-                    invite_reward = self.get_system_config('invite_reward', 5.00)
+    def register_user_with_balance(self, username=None, email=None, password=None, balance=0,
+                                   operator_id=None, description="", method="admin"):
+        """
+        管理员添加用户：创建用户并设置初始余额，在同一个事务中完成
+        余额写入失败时整个操作回滚，不会留下没有初始余额的用户
+        """
+        conn = None
+        try:
+            if not password:
+                return {'success': False, 'message': '密码不能为空'}
 
-                    # 更新邀请人余额
-                    cursor.execute("""
-                        UPDATE users SET
-                            balance = balance + %s,
-                            invite_earnings = invite_earnings + %s
-                        WHERE id = %s
-                    """, (invite_reward, invite_reward, inviter_id))
+            if not username and not email:
+                return {'success': False, 'message': '请提供用户名或邮箱'}
 
-                    # 记录邀请记录 - 添加奖励类型
-                    cursor.execute("""
-                        INSERT INTO invite_records (inviter_id, invitee_id, invite_code, reward_amount, reward_type)
-                        VALUES (%s, %s, %s, %s, %s)
-                    """, (inviter_id, user_id, invite_code, invite_reward, 'registration'))
+            conn = self.get_db_connection()
+            with conn.cursor() as cursor:
+                result = self._insert_user(cursor, username, email, password)
+                if not result['success']:
+                    return result
 
-                conn.commit()
+                if balance > 0 and not self._apply_balance(cursor, result['user_id'], balance, operator_id,
+                                                           description, method):
+                    conn.rollback()
+                    return {'success': False, 'message': '设置初始余额失败'}
 
-                return {
-                    'success': True,
-                    'message': '注册成功',
-                    'user_id': user_id,
-                    'invite_code': user_invite_code,
-                    'bonus': new_user_bonus
-                }
+                conn.commit()
+                return result
 
         except Exception as e:
-            logger.error(f"用户注册失败: {e}")
-            return {'success': False, 'message': '注册失败，请稍后重试'}
+            logger.error(f"添加用户失败: {e}")
+            if conn:
+                conn.rollback()
+            return {'success': False, 'message': '添加用户失败，请稍后重试'}
         finally:
             if conn:
                 conn.close()
@@ -399,76 +444,10 @@ class UserManager:
         try:
             conn = self.get_db_connection()
             with conn.cursor() as cursor:
-                # 防重复处理：检查订单是否已存在
-                if trade_order_id:
-                    cursor.execute("""
-                        SELECT id, status FROM recharge_records
-                        WHERE trade_order_id = %s AND status = 1
-                    """, (trade_order_id,))
-                    existing_order = cursor.fetchone()
-                    if existing_order:
-                        logger.warning(f"订单已处理过，跳过: {trade_order_id}")
-                        return True  # 返回成功，避免支付平台重复通知
-
-                # 检查用户是否存在，同时获取邀请信息
-                cursor.execute("""
-                    SELECT id, username, invited_by, total_recharge
-                    FROM users WHERE id = %s
-                """, (user_id,))
-                user = cursor.fetchone()
-                if not user:
-                    logger.error(f"用户不存在: {user_id}")
+                if not self._apply_balance(cursor, user_id, amount, operator_id, description, method,
+                                           transaction_id, trade_order_id, is_first_recharge):
                     return False
-
-                # 判断是否为首次充值（之前累计充值为0）
-                is_first = is_first_recharge if is_first_recharge is not None else (user['total_recharge'] == 0)
-
-                # 更新用户余额和累计充值
-                cursor.execute("""
-                    UPDATE users SET
-                        balance = balance + %s,
-                        total_recharge = total_recharge + %s
-                    WHERE id = %s
-                """, (amount, amount, user_id))
-
-                # 插入充值记录 - status=1表示已支付
-                cursor.execute("""
-                    INSERT INTO recharge_records
-                    (user_id, amount, payment_method, status, description, admin_id, trade_no, trade_order_id, paid_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW())
-                """, (user_id, amount, method, 1, description, operator_id, transaction_id, trade_order_id))
-
-                # 首充邀请奖励：如果是首次充值且有邀请人，给邀请人10%奖励
-                if is_first and user['invited_by']:
-                    invite_recharge_rate = self.get_system_config('invite_recharge_rate', 0.10)  # 默认10%
-                    invite_recharge_reward = round(amount * invite_recharge_rate, 2)
-
-                    if invite_recharge_reward > 0:
-                        # 查找邀请人
-                        cursor.execute("""
-                            SELECT id, username FROM users WHERE invite_code = %s
-                        """, (user['invited_by'],))
-                        inviter = cursor.fetchone()
-
-                        if inviter:
-                            # 给邀请人增加余额和邀请收益
-                            cursor.execute("""
-                                UPDATE users SET
-                                    balance = balance + %s,
-                                    invite_earnings = invite_earnings + %s
-                                WHERE id = %s
-                            """, (invite_recharge_reward, invite_recharge_reward, inviter['id']))
-
-                            # 记录首充奖励
-                            cursor.execute("""
-                                INSERT INTO invite_records (inviter_id, invitee_id, invite_code, reward_amount, reward_type)
-                                VALUES (%s, %s, %s, %s, %s)
-                            """, (inviter['id'], user_id, user['invited_by'], invite_recharge_reward, 'first_recharge'))
-
-                            logger.info(f"首充邀请奖励: 邀请人 {inviter['username']} 获得 {invite_recharge_reward}元 (被邀请人 {user['username']} 首充 {amount}元)")
-
                 conn.commit()
-                logger.info(f"用户 {user['username']} (ID:{user_id}) 充值成功: {amount}元")
                 return True
 
         except Exception as e:
@@ -480,6 +459,80 @@ class UserManager:
             if conn:
                 conn.close()
 
+    def _apply_balance(self, cursor, user_id, amount, operator_id=None, description="", method="alipay",
+                       transaction_id=None, trade_order_id=None, is_first_recharge=None):
+        """在调用方的事务中给用户增加余额并写充值记录、首充邀请奖励，不提交；用户不存在时返回 False"""
+        # 防重复处理：检查订单是否已存在
+        if trade_order_id:
+            cursor.execute("""
+                SELECT id, status FROM recharge_records
+                WHERE trade_order_id = %s AND status = 1
+            """, (trade_order_id,))
+            existing_order = cursor.fetchone()
+            if existing_order:
+                logger.warning(f"订单已处理过，跳过: {trade_order_id}")
+                return True  # 返回成功，避免支付平台重复通知
+
+        # 检查用户是否存在，同时获取邀请信息
+        cursor.execute("""
+            SELECT id, username, invited_by, total_recharge
+            FROM users WHERE id = %s
+        """, (user_id,))
+        user = cursor.fetchone()
+        if not user:
+            logger.error(f"用户不存在: {user_id}")
+            return False
+
+        # 判断是否为首次充值（之前累计充值为0）
+        is_first = is_first_recharge if is_first_recharge is not None else (user['total_recharge'] == 0)
+
+        # 更新用户余额和累计充值
+        cursor.execute("""
+            UPDATE users SET
+                balance = balance + %s,
+                total_recharge = total_recharge + %s
+            WHERE id = %s
+        """, (amount, amount, user_id))
+
+        # 插入充值记录 - status=1表示已支付
+        cursor.execute("""
+            INSERT INTO recharge_records
+            (user_id, amount, payment_method, status, description, admin_id, trade_no, trade_order_id, paid_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW())
+        """, (user_id, amount, method, 1, description, operator_id, transaction_id, trade_order_id))
+
+        # 首充邀请奖励：如果是首次充值且有邀请人，给邀请人10%奖励
+        if is_first and user['invited_by']:
+            invite_recharge_rate = self.get_system_config('invite_recharge_rate', 0.10)  # 默认10%
+            invite_recharge_reward = round(amount * invite_recharge_rate, 2)
+
+            if invite_recharge_reward > 0:
+                # 查找邀请人
+                cursor.execute("""
+                    SELECT id, username FROM users WHERE invite_code = %s
+                """, (user['invited_by'],))
+                inviter = cursor.fetchone()
+
+                if inviter:
+                    # 给邀请人增加余额和邀请收益
+                    cursor.execute("""
+                        UPDATE users SET
+                            balance = balance + %s,
+                            invite_earnings = invite_earnings + %s
+                        WHERE id = %s
+                    """, (invite_recharge_reward, invite_recharge_reward, inviter['id']))
+
+                    # 记录首充奖励
+                    cursor.execute("""
+                        INSERT INTO invite_records (inviter_id, invitee_id, invite_code, reward_amount, reward_type)
+                        VALUES (%s, %s, %s, %s, %s)
+                    """, (inviter['id'], user_id, user['invited_by'], invite_recharge_reward, 'first_recharge'))
+
+                    logger.info(f"首充邀请奖励: 邀请人 {inviter['username']} 获得 {invite_recharge_reward}元 (被邀请人 {user['username']} 首充 {amount}元)")
+
+        logger.info(f"用户 {user['username']} (ID:{user_id}) 充值成功: {amount}元")
+        return True
+
     def create_pending_order(self, user_id, amount, payment_method='alipay'):
         """
         创建待支付订单
@@ -1785,6 +1838,57 @@ class UserManager:
             if conn:
                 conn.close()
 
+    def _build_export_query(self, search=None, status=None, date_start=None, date_end=None,
+                            balance_min=None, balance_max=None, sort_by='created_at', sort_order='DESC'):
+        """构建导出用户列表的SQL和参数"""
+        where_conditions = ["role = 'user'"]
+        params = []
+
+        if search:
+            # 前缀匹配可以走 username/email 索引，%xxx% 会全表扫描
+            pattern = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            where_conditions.append("(username LIKE %s OR email LIKE %s)")
+            params.extend([pattern, pattern])
+
+        if status is not None:
+            where_conditions.append("status = %s")
+            params.append(status)
+
+        # 直接比较 created_at 而不是 DATE(created_at)，才能用上 created_at 索引
+        if date_start:
+            where_conditions.append("created_at >= %s")
+            params.append(date_start)
+
+        if date_end:
+            where_conditions.append("created_at < DATE_ADD(%s, INTERVAL 1 DAY)")
+            params.append(date_end)
+
+        if balance_min is not None:
+            where_conditions.append("balance >= %s")
+            params.append(balance_min)
+
+        if balance_max is not None:
+            where_conditions.append("balance <= %s")
+            params.append(balance_max)
+
+        where_clause = " WHERE " + " AND ".join(where_conditions)
+
+        # 验证排序字段
+        valid_sort_fields = ['id', 'username', 'email', 'balance', 'total_recharge',
+                           'total_consumption', 'created_at', 'last_login_at']
+        if sort_by not in valid_sort_fields:
+            sort_by = 'created_at'
+        sort_order = 'DESC' if sort_order.upper() == 'DESC' else 'ASC'
+
+        sql = f"""
+            SELECT
+                id, username, email, balance, total_recharge, total_consumption,
+                invite_earnings, status, created_at, last_login_at, invite_code
+            FROM users{where_clause}
+            ORDER BY {sort_by} {sort_order}
+        """
+        return sql, params
+
     def export_users(self, search=None, status=None, role=None, date_start=None, date_end=None,
                      balance_min=None, balance_max=None, sort_by='created_at', sort_order='DESC'):
         """导出用户列表"""
@@ -1792,55 +1896,40 @@ class UserManager:
         try:
             conn = self.get_db_connection()
             with conn.cursor() as cursor:
-                where_conditions = ["role = 'user'"]
-                params = []
-
-                if search:
-                    where_conditions.append("(username LIKE %s OR email LIKE %s)")
-                    params.extend([f"%{search}%", f"%{search}%"])
-
-                if status is not None:
-                    where_conditions.append("status = %s")
-                    params.append(status)
-
-                if date_start:
-                    where_conditions.append("DATE(created_at) >= %s")
-                    params.append(date_start)
+                sql, params = self._build_export_query(search, status, date_start, date_end,
+                                                       balance_min, balance_max, sort_by, sort_order)
+                cursor.execute(sql, params)
 
-                if date_end:
-                    where_conditions.append("DATE(created_at) <= %s")
-                    params.append(date_end)
-
-                if balance_min is not None:
-                    where_conditions.append("balance >= %s")
-                    params.append(balance_min)
-
-                if balance_max is not None:
-                    where_conditions.append("balance <= %s")
-                    params.append(balance_max)
-
-                where_clause = " WHERE " + " AND ".join(where_conditions)
+                return cursor.fetchall()
 
-                # 验证排序字段
-                valid_sort_fields = ['id', 'username', 'email', 'balance', 'total_recharge',
-                                   'total_consumption', 'created_at', 'last_login_at']
-                if sort_by not in valid_sort_fields:
-                    sort_by = 'created_at'
-                sort_order = 'DESC' if sort_order.upper() == 'DESC' else 'ASC'
+        except Exception as e:
+            logger.error(f"导出用户列表失败: {e}")
+            return []
+        finally:
+            if conn:
+                conn.close()
 
-                cursor.execute(f"""
-                    SELECT
-                        id, username, email, balance, total_recharge, total_consumption,
-                        invite_earnings, status, created_at, last_login_at, invite_code
-                    FROM users{where_clause}
-                    ORDER BY {sort_by} {sort_order}
-                """, params)
+    def iter_export_users(self, search=None, status=None, role=None, date_start=None, date_end=None,
+                          balance_min=None, balance_max=None, sort_by='created_at', sort_order='DESC'):
+        """
+        逐行导出用户列表（生成器）
+        使用服务端游标（SSDictCursor）边读边返回，不把全部结果加载到内存
+        """
+        conn = None
+        try:
+            conn = self.get_db_connection()
+            with conn.cursor(pymysql.cursors.SSDictCursor) as cursor:
+                sql, params = self._build_export_query(search, status, date_start, date_end,
+                                                       balance_min, balance_max, sort_by, sort_order)
+                cursor.execute(sql, params)
 
-                return cursor.fetchall()
+                for row in cursor:
+                    yield row
 
         except Exception as e:
+            # 继续抛出，让流式响应中断，而不是当作正常结束发出一个不完整的文件
             logger.error(f"导出用户列表失败: {e}")
-            return []
+            raise
         finally:
             if conn:
                 conn.close()